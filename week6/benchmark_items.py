@@ -0,0 +1,67 @@
+import re
+import sys
+import time
+import random
+import subprocess
+from items import Item
+
+# Benchmarks for items.py
+# Usage: python benchmark_items.py
+
+def time_in_fresh_interpreter(code):
+    """
+    Run this code in a new Python process, so that nothing is already imported, and return the seconds it took
+    """
+    script = f"import time\nstart = time.perf_counter()\n{code}\nprint(time.perf_counter() - start)"
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+def benchmark_import():
+    """
+    Importing items should take milliseconds, as the tokenizer isn't loaded until an Item needs it
+    """
+    print(f"import items:                        {time_in_fresh_interpreter('import items')*1000:>10,.1f} ms")
+    print(f"import transformers (for comparison): {time_in_fresh_interpreter('import transformers')*1000:>9,.1f} ms")
+    print(f"first use of Item.tokenizer:         {time_in_fresh_interpreter('from items import Item; Item.tokenizer')*1000:>10,.1f} ms")
+
+def original_scrub_details(details):
+    for remove in Item.REMOVALS:
+        details = details.replace(remove, "")
+    return details
+
+def original_scrub(stuff):
+    stuff = re.sub(r'[:\[\]"{}【】\s]+', ' ', stuff).strip()
+    stuff = stuff.replace(" ,", ",").replace(",,,",",").replace(",,",",")
+    words = stuff.split(' ')
+    select = [word for word in words if len(word)<7 or not any(char.isdigit() for char in word)]
+    return " ".join(select)
+
+def synthetic_text(rng, words=150):
+    vocabulary = ["Item", "Weight", "Number of", "Package", "Dimensions", "8.5", "x", "inches", ":", '"', ",", "{", "}", "Stainless", "AX-39281B", "B07XJ8C8F5", "Product ", "compatible", "Best Sellers", "Rank"]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+def benchmark_scrub(count=20_000):
+    """
+    Compare the original scrubbing code with the compiled Scrubber, checking the output is identical
+    """
+    rng = random.Random(42)
+    texts = [synthetic_text(rng) for _ in range(count)]
+    scrubber = Item.scrubber
+    scrubber.scrub("warm up")
+    cases = [
+        ("scrub_details", lambda: [original_scrub_details(t) for t in texts], lambda: scrubber.scrub_details_batch(texts)),
+        ("scrub", lambda: [original_scrub(t) for t in texts], lambda: scrubber.scrub_batch(texts)),
+    ]
+    for name, original, compiled in cases:
+        start = time.perf_counter()
+        expected = original()
+        original_time = time.perf_counter() - start
+        start = time.perf_counter()
+        actual = compiled()
+        compiled_time = time.perf_counter() - start
+        assert actual == expected, f"{name} output differs"
+        print(f"{name:<14} original {original_time*1000:>8,.1f} ms  compiled {compiled_time*1000:>8,.1f} ms  speedup {original_time/compiled_time:.1f}x")
+
+if __name__ == "__main__":
+    benchmark_import()
+    benchmark_scrub()
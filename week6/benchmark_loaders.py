@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+import random
+import tempfile
+import threading
+import psutil
+from concurrent.futures import ProcessPoolExecutor
+from datasets import Dataset, load_from_disk
+from loaders import ItemLoader
+
+# Compare the original way of farming out chunks (pickling the ItemLoader and each chunk to the workers)
+# with the pool initializer that memory-maps the Dataset once per worker and only sends (start, end) ranges.
+# Uses a synthetic Dataset that looks like the Amazon data, so nothing needs to be downloaded except the tokenizer.
+# Usage: python benchmark_loaders.py [datapoints] [workers]
+
+WORDS = "battery charger cable adapter wireless portable stainless steel compatible replacement heavy duty premium kit".split()
+
+def synthetic_datapoint(rng):
+    sentence = lambda n: " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+    return {
+        "title": sentence(8),
+        "description": [sentence(30) for _ in range(4)],
+        "features": [sentence(12) for _ in range(5)],
+        "details": f'{{"Brand": "Acme", "Item Weight": "{rng.randint(1, 90)} ounces", "Item model number": "AX{rng.randint(10000, 99999)}"}}',
+        "price": f"{rng.uniform(0.1, 1200):.2f}" if rng.random() > 0.1 else "None",
+    }
+
+def synthetic_dataset(size, directory):
+    rng = random.Random(42)
+    Dataset.from_list([synthetic_datapoint(rng) for _ in range(size)]).save_to_disk(directory)
+    return load_from_disk(directory)
+
+class PeakMemory:
+    """
+    Sample the combined RSS of this process and its children in a background thread
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self.running = False
+
+    def sample(self):
+        process = psutil.Process()
+        while self.running:
+            rss = process.memory_info().rss
+            for child in process.children(recursive=True):
+                try:
+                    rss += child.memory_info().rss
+                except psutil.NoSuchProcess:
+                    pass
+            self.peak = max(self.peak, rss)
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.running = False
+        self.thread.join()
+
+def pickled_chunks(loader, workers):
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for batch in pool.map(loader.from_chunk, loader.chunk_generator()):
+            results.extend(batch)
+    return results
+
+def ranges(loader, workers):
+    return loader.load_in_parallel(workers)
+
+def measure(label, method, loader, workers):
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        results = method(loader, workers)
+        elapsed = time.perf_counter() - start
+    print(f"{label:<16} {len(results):>8,} items {len(results)/elapsed:>10,.0f} items/sec  peak RSS {memory.peak/1024**2:>8,.0f} MB")
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    with tempfile.TemporaryDirectory() as directory:
+        loader = ItemLoader("Synthetic")
+        loader.dataset = synthetic_dataset(size, os.path.join(directory, "synthetic"))
+        print(f"Benchmarking {size:,} datapoints with {workers} workers")
+        measure("pickled chunks", pickled_chunks, loader, workers)
+        measure("index ranges", ranges, loader, workers)
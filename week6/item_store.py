@@ -0,0 +1,206 @@
+import pickle
+import numpy as np
+import pyarrow as pa
+from items import Item
+
+SCHEMA = pa.schema([
+    ("title", pa.large_string()),
+    ("details", pa.large_string()),
+    ("prompt", pa.large_string()),
+    ("category", pa.dictionary(pa.int32(), pa.string())),
+    ("price", pa.float64()),
+    ("token_count", pa.int32()),
+])
+
+
+class ItemView:
+    """
+    A lightweight, read-only stand-in for an Item that reads its fields from an ItemStore on demand
+    It has the same attributes and methods as an Item, so it can be passed to a Tester or a predictor
+    """
+
+    __slots__ = ("store", "row")
+
+    PREFIX = Item.PREFIX
+    QUESTION = Item.QUESTION
+    include = True
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def value(self, column):
+        return self.store.table.column(column)[self.row].as_py()
+
+    @property
+    def title(self):
+        return self.value("title")
+
+    @property
+    def details(self):
+        return self.value("details")
+
+    @property
+    def prompt(self):
+        return self.value("prompt")
+
+    @property
+    def category(self):
+        return self.value("category")
+
+    @property
+    def price(self):
+        return float(self.store.prices[self.row])
+
+    @property
+    def token_count(self):
+        return int(self.store.token_counts[self.row])
+
+    def test_prompt(self):
+        """
+        Return a prompt suitable for testing, with the actual price removed
+        """
+        return self.prompt.split(self.PREFIX)[0] + self.PREFIX
+
+    def to_item(self) -> Item:
+        """
+        Return a full Item object with the same contents as this view
+        """
+        item = Item.__new__(Item)
+        for column in SCHEMA.names:
+            setattr(item, column, getattr(self, column))
+        item.include = True
+        return item
+
+    def __repr__(self):
+        return f"<{self.title} = ${self.price}>"
+
+
+class ItemStore:
+    """
+    A compact, columnar collection of Items backed by an Arrow table, with the numeric columns as NumPy arrays
+    It's saved as an Arrow IPC file that's memory-mapped when loaded, so loading is near-instant and
+    the strings are only read from disk when an item is actually used
+    """
+
+    def __init__(self, table: pa.Table, rows=None):
+        """
+        Create a store over this table; rows optionally restricts it to a subset of the table's rows
+        """
+        self.table = table
+        self.prices = table.column("price").to_numpy()
+        self.token_counts = table.column("token_count").to_numpy()
+        self.rows = np.arange(len(table)) if rows is None else np.asarray(rows)
+        self.all_categories = None
+
+    def subset(self, rows):
+        """
+        Return a store over some of the rows of this one, sharing the same table and arrays
+        """
+        store = ItemStore.__new__(ItemStore)
+        store.table = self.table
+        store.prices = self.prices
+        store.token_counts = self.token_counts
+        store.all_categories = self.all_categories
+        store.rows = rows
+        return store
+
+    @classmethod
+    def from_items(cls, items):
+        """
+        Build a store from a list of Items, such as the lists that were pickled in week 6
+        """
+        table = pa.table({
+            "title": [item.title for item in items],
+            "details": [item.details for item in items],
+            "prompt": [item.prompt for item in items],
+            "category": [getattr(item, "category", None) for item in items],
+            "price": [item.price for item in items],
+            "token_count": [item.token_count for item in items],
+        }, schema=SCHEMA)
+        return cls(table.combine_chunks())
+
+    @classmethod
+    def from_pickle(cls, path):
+        """
+        Build a store from a pickle file containing a list of Items, like train.pkl or test.pkl
+        """
+        with open(path, "rb") as file:
+            return cls.from_items(pickle.load(file))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Memory-map a store that was written with save()
+        """
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        return cls(table)
+
+    def save(self, path):
+        """
+        Write the items in this store to an Arrow IPC file that can be memory-mapped by load()
+        """
+        table = self.table.take(pa.array(self.rows))
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, SCHEMA) as writer:
+                writer.write_table(table.combine_chunks())
+
+    def to_items(self):
+        """
+        Return a list of full Item objects
+        """
+        return [view.to_item() for view in self]
+
+    def to_pickle(self, path):
+        """
+        Write the items to a pickle file in the same format as train.pkl and test.pkl
+        """
+        with open(path, "wb") as file:
+            pickle.dump(self.to_items(), file)
+
+    def categories(self):
+        """
+        Return the category of every item in the store, as an array of strings
+        """
+        if self.all_categories is None:
+            self.all_categories = self.table.column("category").cast(pa.string()).to_numpy()
+        return self.all_categories[self.rows]
+
+    def filter(self, category=None, min_price=None, max_price=None, min_tokens=None, max_tokens=None):
+        """
+        Return a new store containing only the items matching all of the given criteria,
+        computed in one vectorized pass without creating any Items
+        """
+        mask = np.ones(len(self.rows), dtype=bool)
+        prices = self.prices[self.rows]
+        token_counts = self.token_counts[self.rows]
+        if category is not None:
+            mask &= self.categories() == category
+        if min_price is not None:
+            mask &= prices >= min_price
+        if max_price is not None:
+            mask &= prices <= max_price
+        if min_tokens is not None:
+            mask &= token_counts >= min_tokens
+        if max_tokens is not None:
+            mask &= token_counts <= max_tokens
+        return self.subset(self.rows[mask])
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        """
+        Return an ItemView for an integer index, or a new store for a slice or an array of indices
+        """
+        if isinstance(index, (int, np.integer)):
+            return ItemView(self, int(self.rows[index]))
+        return self.subset(self.rows[index])
+
+    def __iter__(self):
+        for row in self.rows:
+            yield ItemView(self, int(row))
+
+    def __repr__(self):
+        return f"<ItemStore with {len(self):,} items>"
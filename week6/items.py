@@ -1,6 +1,7 @@
-from typing import Optional
-from transformers import AutoTokenizer
+from typing import Optional, List
+import os
 import re
+import sys
 
 BASE_MODEL = "meta-llama/Meta-Llama-3.1-8B"
 
@@ -10,15 +11,99 @@ MAX_TOKENS = 160 # Truncate after this many tokens. Then after adding in prompt
 MIN_CHARS = 300
 CEILING_CHARS = MAX_TOKENS * 7
 
+# The tokenizer is saved here as a fast-tokenizer JSON after the first download, so later loads are local
+
+TOKENIZER_CACHE = os.getenv("TOKENIZER_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "pricer-tokenizers"))
+
+def load_tokenizer():
+    """
+    Load the tokenizer for BASE_MODEL from the local cache, or download it and save it there
+    transformers is only imported here, so that importing items.py stays fast
+    """
+    from transformers import AutoTokenizer, PreTrainedTokenizerFast
+    path = os.path.join(TOKENIZER_CACHE, BASE_MODEL.replace("/", "--"))
+    if os.path.exists(os.path.join(path, "tokenizer.json")):
+        return PreTrainedTokenizerFast.from_pretrained(path)
+    tokenizer = AutoTokenizer.from_pretrained(BASE_MODEL, trust_remote_code=True)
+    tokenizer.save_pretrained(path)
+    return tokenizer
+
+class LazyTokenizer:
+    """
+    Makes Item.tokenizer load the tokenizer the first time it's used, rather than when items.py is imported
+    """
+    tokenizer = None
+
+    def __get__(self, instance, owner):
+        if LazyTokenizer.tokenizer is None:
+            LazyTokenizer.tokenizer = load_tokenizer()
+        return LazyTokenizer.tokenizer
+
+class Scrubber:
+    """
+    The text cleaning used by Item.scrub and Item.scrub_details, with its regular expressions compiled once,
+    and batch versions that clean a whole chunk of text at a time
+    The output is exactly the same as the original step-by-step versions
+    """
+
+    PUNCTUATION = re.compile(r'[:\[\]"{}【】\s]+')
+
+    def __init__(self, removals):
+        self.removals = removals
+        self.product_numbers = None
+
+    def compile_product_numbers(self):
+        """
+        Compile a regex that matches a space followed by a word of 7+ chars containing a digit
+        str.isdigit() is True for a few more chars than \\d (like superscripts), so those are added to the class
+        as ranges to give exactly the same words as the original check; finding them takes a moment, so it's done on first use
+        """
+        ranges = []
+        for c in range(sys.maxunicode + 1):
+            if chr(c).isdigit() and not chr(c).isdecimal():
+                if ranges and ranges[-1][1] == c - 1:
+                    ranges[-1][1] = c
+                else:
+                    ranges.append([c, c])
+        extras = "".join(f"{re.escape(chr(start))}-{re.escape(chr(end))}" for start, end in ranges)
+        return re.compile(rf" (?=[^ ]{{7}})[^ ]*[\d{extras}][^ ]*(?= |\Z)")
+
+    def scrub_details(self, details: str) -> str:
+        """
+        Remove each of the removals in turn - the order matters, as removing one can create or break up another,
+        so this can't be done as a single regex; str.replace is also faster than a regex alternation here
+        """
+        for remove in self.removals:
+            details = details.replace(remove, "")
+        return details
+
+    def scrub_details_batch(self, details: List[str]) -> List[str]:
+        return [self.scrub_details(d) for d in details]
+
+    def scrub(self, stuff: str) -> str:
+        """
+        Collapse punctuation and whitespace to single spaces, tidy up commas,
+        then remove words that are 7+ chars and contain numbers
+        """
+        if self.product_numbers is None:
+            self.product_numbers = self.compile_product_numbers()
+        stuff = self.PUNCTUATION.sub(' ', stuff).strip()
+        stuff = stuff.replace(" ,", ",").replace(",,,",",").replace(",,",",")
+        return self.product_numbers.sub("", " " + stuff)[1:]
+
+    def scrub_batch(self, texts: List[str]) -> List[str]:
+        return [self.scrub(text) for text in texts]
+
 class Item:
     """
     An Item is a cleaned, curated datapoint of a Product with a Price
     """
     
-    tokenizer = AutoTokenizer.from_pretrained(BASE_MODEL, trust_remote_code=True)
+    tokenizer = LazyTokenizer()
     PREFIX = "Price is $"
     QUESTION = "How much does this cost to the nearest dollar?"
     REMOVALS = ['"Batteries Included?": "No"', '"Batteries Included?": "Yes"', '"Batteries Required?": "No"', '"Batteries Required?": "Yes"', "By Manufacturer", "Item", "Date First", "Package", ":", "Number of", "Best Sellers", "Number", "Product "]
+    scrubber = Scrubber(REMOVALS)
 
     title: str
     price: float
@@ -28,6 +113,9 @@ class Item:
     prompt: Optional[str] = None
     include = False
 
+    _question_count = None
+    _suffix_counts = {}
+
     def __init__(self, data, price):
         self.title = data['title']
         self.price = price
@@ -37,26 +125,20 @@ class Item:
         """
         Clean up the details string by removing common text that doesn't add value
         """
-        details = self.details
-        for remove in self.REMOVALS:
-            details = details.replace(remove, "")
-        return details
+        return self.scrubber.scrub_details(self.details)
 
     def scrub(self, stuff):
         """
         Clean up the provided text by removing unnecessary characters and whitespace
         Also remove words that are 7+ chars and contain numbers, as these are likely irrelevant product numbers
         """
-        stuff = re.sub(r'[:\[\]"{}【】\s]+', ' ', stuff).strip()
-        stuff = stuff.replace(" ,", ",").replace(",,,",",").replace(",,",",")
-        words = stuff.split(' ')
-        select = [word for word in words if len(word)<7 or not any(char.isdigit() for char in word)]
-        return " ".join(select)
-    
-    def parse(self, data):
+        return self.scrubber.scrub(stuff)
+
+    def text_for(self, data, scrubbed_details=None):
         """
-        Parse this datapoint and if it fits within the allowed Token range,
-        then set include to True
+        Build the scrubbed text for this datapoint that's ready to be tokenized,
+        or return None if there isn't enough content to be useful
+        scrubbed_details can be passed in if the details have already been scrubbed as part of a batch
         """
         contents = '\n'.join(data['description'])
         if contents:
@@ -66,10 +148,19 @@ class Item:
             contents += features + '\n'
         self.details = data['details']
         if self.details:
-            contents += self.scrub_details() + '\n'
+            contents += (scrubbed_details if scrubbed_details is not None else self.scrub_details()) + '\n'
         if len(contents) > MIN_CHARS:
             contents = contents[:CEILING_CHARS]
-            text = f"{self.scrub(self.title)}\n{self.scrub(contents)}"
+            return f"{self.scrub(self.title)}\n{self.scrub(contents)}"
+        return None
+
+    def parse(self, data):
+        """
+        Parse this datapoint and if it fits within the allowed Token range,
+        then set include to True
+        """
+        text = self.text_for(data)
+        if text:
             tokens = self.tokenizer.encode(text, add_special_tokens=False)
             if len(tokens) > MIN_TOKENS:
                 tokens = tokens[:MAX_TOKENS]
@@ -85,6 +176,74 @@ class Item:
         self.prompt += f"{self.PREFIX}{str(round(self.price))}.00"
         self.token_count = len(self.tokenizer.encode(self.prompt, add_special_tokens=False))
 
+    @classmethod
+    def suffix_token_count(cls, price):
+        """
+        Return the number of tokens in the end of a prompt, from the blank line after the text
+        through to the price - there are only ~1,000 distinct values so they are cached
+        """
+        suffix = f"\n\n{cls.PREFIX}{str(round(price))}.00"
+        if suffix not in cls._suffix_counts:
+            cls._suffix_counts[suffix] = len(cls.tokenizer.encode(suffix, add_special_tokens=False))
+        return cls._suffix_counts[suffix]
+
+    @staticmethod
+    def clean_boundaries(original, text):
+        """
+        Check whether the decoded text will tokenize to exactly its own tokens when it's placed
+        inside the prompt: it must start and end on a word (not on whitespace or punctuation,
+        which would merge with the surrounding blank lines) and be an exact prefix of the
+        original text that was cut at the end of a word
+        """
+        if not text or text[0] in "\r\n" or not text[-1].isalnum():
+            return False
+        if len(text) == len(original):
+            return text == original
+        return original.startswith(text) and not original[len(text)].isalnum()
+
+    @classmethod
+    def from_batch(cls, datapoints, prices) -> List["Item"]:
+        """
+        Create Items for a whole chunk of datapoints at once, giving the same results as
+        calling Item(datapoint, price) for each, but with one call to the fast tokenizer
+        to encode the chunk and one call to decode it.
+        The token_count is the sum of the token lengths of the question, the text and the price,
+        rather than encoding each prompt a second time. Prompts where that sum isn't exact
+        are encoded together at the end.
+        """
+        items, candidates, texts = [], [], []
+        all_details = cls.scrubber.scrub_details_batch([data['details'] or "" for data in datapoints])
+        for data, price, details in zip(datapoints, prices, all_details):
+            item = cls.__new__(cls)
+            item.title = data['title']
+            item.price = price
+            text = item.text_for(data, details)
+            if text:
+                candidates.append(item)
+                texts.append(text)
+            items.append(item)
+        if not texts:
+            return items
+        encoded = cls.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        selected = [(item, text, tokens[:MAX_TOKENS]) for item, text, tokens in zip(candidates, texts, encoded) if len(tokens) > MIN_TOKENS]
+        decoded = cls.tokenizer.batch_decode([tokens for _, _, tokens in selected])
+        if cls._question_count is None:
+            cls._question_count = len(cls.tokenizer.encode(f"{cls.QUESTION}\n\n", add_special_tokens=False))
+        unclean = []
+        for (item, original, tokens), text in zip(selected, decoded):
+            item.prompt = f"{cls.QUESTION}\n\n{text}\n\n"
+            item.prompt += f"{cls.PREFIX}{str(round(item.price))}.00"
+            item.include = True
+            if cls.clean_boundaries(original, text):
+                item.token_count = cls._question_count + len(tokens) + cls.suffix_token_count(item.price)
+            else:
+                unclean.append(item)
+        if unclean:
+            encoded = cls.tokenizer([item.prompt for item in unclean], add_special_tokens=False)["input_ids"]
+            for item, tokens in zip(unclean, encoded):
+                item.token_count = len(tokens)
+        return items
+
     def test_prompt(self):
         """
         Return a prompt suitable for testing, with the actual price removed
@@ -1,45 +1,91 @@
+import os
+import json
 from datetime import datetime
+from itertools import islice
 from tqdm import tqdm
-from datasets import load_dataset
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datasets import load_dataset, Dataset, concatenate_datasets
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import pyarrow as pa
+import pyarrow.parquet as pq
 from items import Item
 
 CHUNK_SIZE = 1000
 MIN_PRICE = 0.5
 MAX_PRICE = 999.49
 
+# Each worker process keeps its own ItemLoader, set up once by init_worker
+
+worker_loader = None
+
+def init_worker(name, cache_files, dataset=None):
+    """
+    Runs once in each worker process when the pool starts: memory-map the Dataset from the
+    Hugging Face cache (or use the in-memory Dataset if there are no cache files) and make sure the
+    tokenizer is ready, so that tasks only need to send the (start, end) range of their chunk
+    """
+    global worker_loader
+    worker_loader = ItemLoader(name)
+    if cache_files:
+        worker_loader.dataset = concatenate_datasets([Dataset.from_file(f) for f in cache_files])
+    else:
+        worker_loader.dataset = dataset
+    Item.tokenizer  # so the tokenizer is in place before the first chunk arrives
+
+def process_range(bounds):
+    """
+    Process the datapoints from start to end in this worker's Dataset
+    """
+    start, end = bounds
+    return worker_loader.from_chunk(worker_loader.dataset.select(range(start, end)))
+
 class ItemLoader:
 
 
-    def __init__(self, name):
+    def __init__(self, name, checkpoint_dir=None):
+        """
+        Create a loader for this category; if a checkpoint_dir is given, then each chunk is
+        saved there as it completes, and a later load() will pick up where this one left off
+        """
         self.name = name
         self.dataset = None
+        self.checkpoint_dir = checkpoint_dir
 
-    def from_datapoint(self, datapoint):
+    def price_for(self, datapoint):
         """
-        Try to create an Item from this datapoint
-        Return the Item if successful, or None if it shouldn't be included
+        Return the price of this datapoint as a float,
+        or None if it's missing, invalid or outside the allowed range
         """
         try:
             price_str = datapoint['price']
             if price_str:
                 price = float(price_str)
                 if MIN_PRICE <= price <= MAX_PRICE:
-                    item = Item(datapoint, price)
-                    return item if item.include else None
+                    return price
         except ValueError:
             return None
 
+    def from_datapoint(self, datapoint):
+        """
+        Try to create an Item from this datapoint
+        Return the Item if successful, or None if it shouldn't be included
+        """
+        price = self.price_for(datapoint)
+        if price is not None:
+            item = Item(datapoint, price)
+            return item if item.include else None
+
     def from_chunk(self, chunk):
         """
-        Create a list of Items from this chunk of elements from the Dataset
+        Create a list of Items from this chunk of elements from the Dataset,
+        tokenizing the whole chunk in one batch
         """
-        batch = []
+        datapoints, prices = [], []
         for datapoint in chunk:
-            result = self.from_datapoint(datapoint)
-            if result:
-                batch.append(result)
-        return batch
+            price = self.price_for(datapoint)
+            if price is not None:
+                datapoints.append(datapoint)
+                prices.append(price)
+        return [item for item in Item.from_batch(datapoints, prices) if item.include]
 
     def chunk_generator(self):
         """
@@ -49,20 +95,161 @@ class ItemLoader:
         for i in range(0, size, CHUNK_SIZE):
             yield self.dataset.select(range(i, min(i + CHUNK_SIZE, size)))
 
+    def chunk_bounds(self, index):
+        """
+        Return the (start, end) range of the chunk of datapoints with this index
+        """
+        start = index * CHUNK_SIZE
+        return start, min(start + CHUNK_SIZE, len(self.dataset))
+
+    def pool(self, workers):
+        """
+        Create a pool of worker processes that each open the Dataset once up front;
+        if the Dataset is backed by cache files then only their filenames are sent to the workers
+        """
+        cache_files = [f["filename"] for f in self.dataset.cache_files]
+        if self.dataset._indices is not None:  # a select() or shuffle() view isn't the same as its files
+            cache_files = []
+        dataset = None if cache_files else self.dataset
+        return ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(self.name, cache_files, dataset))
+
+    def chunk_count(self):
+        return (len(self.dataset) + CHUNK_SIZE - 1) // CHUNK_SIZE
+
+    def chunk_path(self, index):
+        return os.path.join(self.checkpoint_dir, self.name, f"chunk_{index:05d}.parquet")
+
+    def manifest_path(self):
+        return os.path.join(self.checkpoint_dir, self.name, "manifest.json")
+
+    def manifest(self):
+        """
+        Describe how this Dataset is split into chunks, so that checkpoints are only reused for the same split
+        """
+        return {"chunk_size": CHUNK_SIZE, "length": len(self.dataset), "fingerprint": getattr(self.dataset, "_fingerprint", None)}
+
+    def check_manifest(self):
+        """
+        Make sure any checkpointed chunks were made from this Dataset with this CHUNK_SIZE, raising a ValueError if not,
+        and record the manifest so that a later run can check it in turn
+        """
+        manifest, path = self.manifest(), self.manifest_path()
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                saved = json.load(file)
+            if saved != manifest:
+                raise ValueError(f"Checkpoints in {os.path.dirname(path)} were made with {saved}, not {manifest}; remove them to start again")
+            return
+        if self.completed_chunks():
+            raise ValueError(f"Checkpoints in {os.path.dirname(path)} have no manifest, so can't be resumed; remove them to start again")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(manifest, file)
+
+    def completed_chunks(self):
+        """
+        Return the set of chunk indices that have already been checkpointed to disk
+        """
+        if not self.checkpoint_dir:
+            return set()
+        directory = os.path.join(self.checkpoint_dir, self.name)
+        if not os.path.isdir(directory):
+            return set()
+        return {int(f[len("chunk_"):-len(".parquet")]) for f in os.listdir(directory) if f.startswith("chunk_") and f.endswith(".parquet")}
+
+    def save_chunk(self, index, batch):
+        """
+        Write the Items from this chunk to a Parquet file; it's written to a temporary file
+        and then renamed, so a crash can never leave a half-written chunk behind
+        """
+        path = self.chunk_path(index)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.table({
+            "title": [item.title for item in batch],
+            "details": [item.details for item in batch],
+            "prompt": [item.prompt for item in batch],
+            "price": pa.array([item.price for item in batch], type=pa.float64()),
+            "token_count": pa.array([item.token_count for item in batch], type=pa.int32()),
+        })
+        pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    def read_chunk(self, index):
+        """
+        Read back the Items for a chunk that was checkpointed to disk
+        """
+        batch = []
+        for row in pq.read_table(self.chunk_path(index)).to_pylist():
+            item = Item.__new__(Item)
+            item.title = row["title"]
+            item.details = row["details"]
+            item.prompt = row["prompt"]
+            item.price = row["price"]
+            item.token_count = row["token_count"]
+            item.category = self.name
+            item.include = True
+            batch.append(item)
+        return batch
+
+    def indexed_stream(self, workers=8, in_flight=None):
+        """
+        Yield (index, Items) for each chunk as it completes - chunks may arrive out of order.
+        Chunks already checkpointed are read back from disk first rather than being processed again.
+        At most in_flight chunks (default: twice the workers) are submitted to the pool at once,
+        so memory stays bounded by the chunks being worked on rather than the size of the dataset
+        """
+        if self.checkpoint_dir:
+            self.check_manifest()
+        done = self.completed_chunks()
+        for index in sorted(done):
+            yield index, self.read_chunk(index)
+        todo = iter([index for index in range(self.chunk_count()) if index not in done])
+        with self.pool(workers) as pool:
+            futures = {pool.submit(process_range, self.chunk_bounds(index)): index for index in islice(todo, in_flight or workers * 2)}
+            with tqdm(total=self.chunk_count(), initial=len(done)) as progress:
+                while futures:
+                    finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        index = futures.pop(future)
+                        batch = future.result()
+                        for item in batch:
+                            item.category = self.name
+                        if self.checkpoint_dir:
+                            self.save_chunk(index, batch)
+                        progress.update()
+                        for next_index in islice(todo, 1):
+                            futures[pool.submit(process_range, self.chunk_bounds(next_index))] = next_index
+                        yield index, batch
+
+    def stream(self, workers=8, in_flight=None):
+        """
+        Yield lists of Items, one per chunk, as each chunk completes - chunks may arrive out of order
+        """
+        for _, batch in self.indexed_stream(workers, in_flight):
+            yield batch
+
     def load_in_parallel(self, workers):
         """
         Use concurrent.futures to farm out the work to process chunks of datapoints -
         This speeds up processing significantly, but will tie up your computer while it's doing so!
+        The Items come back in the same order as the Dataset, however the chunks finished
         """
-        results = []
-        chunk_count = (len(self.dataset) // CHUNK_SIZE) + 1
-        with ProcessPoolExecutor(max_workers=workers) as pool:
-            for batch in tqdm(pool.map(self.from_chunk, self.chunk_generator()), total=chunk_count):
-                results.extend(batch)
-        for result in results:
-            result.category = self.name
-        return results
-            
+        batches = dict(self.indexed_stream(workers))
+        return [item for index in range(self.chunk_count()) for item in batches[index]]
+
+    def fetch_dataset(self):
+        if self.dataset is None:
+            self.dataset = load_dataset("McAuley-Lab/Amazon-Reviews-2023", f"raw_meta_{self.name}", split="full", trust_remote_code=True)
+
+    def load_streaming(self, workers=8):
+        """
+        Like load(), but yield the Items chunk by chunk as they complete rather than returning them all at the end,
+        so not in the Dataset's order; use this with a checkpoint_dir so that an interrupted run can be resumed
+        """
+        print(f"Loading dataset {self.name}", flush=True)
+        self.fetch_dataset()
+        yield from self.stream(workers)
+
     def load(self, workers=8):
         """
         Load in this dataset; the workers parameter specifies how many processes
@@ -70,7 +257,7 @@ class ItemLoader:
         """
         start = datetime.now()
         print(f"Loading dataset {self.name}", flush=True)
-        self.dataset = load_dataset("McAuley-Lab/Amazon-Reviews-2023", f"raw_meta_{self.name}", split="full", trust_remote_code=True)
+        self.fetch_dataset()
         results = self.load_in_parallel(workers)
         finish = datetime.now()
         print(f"Completed {self.name} with {len(results):,} datapoints in {(finish-start).total_seconds()/60:.1f} mins", flush=True)
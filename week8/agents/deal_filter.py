@@ -0,0 +1,75 @@
+import re
+from typing import List, Optional, Set
+from agents.deals import ScrapedDeal
+
+# A dollar amount that isn't a discount, like "$1,299.99" but not "$50 off"
+PRICE_PATTERN = re.compile(r"(?<!save )(?<!by )\$\s?((?>\d{1,3}(?:,\d{3})+(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?))(?!\s*off)", re.IGNORECASE)
+
+
+def extract_price(text: str) -> Optional[float]:
+    """
+    Return the first price mentioned in this text that's greater than 0, or None if there isn't one
+    """
+    for match in PRICE_PATTERN.finditer(text):
+        price = float(match.group(1).replace(",", ""))
+        if price > 0:
+            return price
+    return None
+
+
+class DealFilter:
+    """
+    Narrows down the scraped deals before they're sent to the Scanner Agent's model, so the prompt is smaller and faster:
+    1. Drop deals where no price can be found in the title, summary or details
+    2. Drop near-duplicates - the same deal is often posted to several feeds - keeping the most detailed copy
+    3. Rank what's left by how detailed the description is, and pack the best into a token budget
+    """
+
+    def __init__(self, max_deals: int = 15, token_budget: int = 6000, similarity: float = 0.7):
+        """
+        :param max_deals: the most deals to include
+        :param token_budget: the most tokens of deal descriptions to include, estimated at 4 characters a token
+        :param similarity: the Jaccard similarity of word shingles at or above which two deals are duplicates
+        """
+        self.max_deals = max_deals
+        self.token_budget = token_budget
+        self.similarity = similarity
+
+    @staticmethod
+    def shingles(deal: ScrapedDeal, size: int = 3) -> Set[str]:
+        words = re.findall(r"\w+", f"{deal.title} {deal.details}".lower())
+        return {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+
+    @staticmethod
+    def richness(deal: ScrapedDeal) -> int:
+        """
+        Score how detailed a deal's description is - the number of words in its details, plus a bonus for listing features
+        """
+        return len(deal.details.split()) + (50 if deal.features.strip() else 0)
+
+    def deduplicate(self, deals: List[ScrapedDeal]) -> List[ScrapedDeal]:
+        """
+        Keep the richest copy of each group of near-duplicate deals, returning them richest first
+        There are only ~50 deals per scan, so comparing exact shingle sets pairwise is cheap
+        """
+        kept, kept_shingles = [], []
+        for deal in sorted(deals, key=self.richness, reverse=True):
+            shingles = self.shingles(deal)
+            if all(len(shingles & other) / len(shingles | other) < self.similarity for other in kept_shingles):
+                kept.append(deal)
+                kept_shingles.append(shingles)
+        return kept
+
+    def select(self, deals: List[ScrapedDeal]) -> List[ScrapedDeal]:
+        """
+        Return the best deals to send to the model, most detailed first
+        """
+        priced = [deal for deal in deals if extract_price(f"{deal.title} {deal.summary} {deal.details}") is not None]
+        selected, tokens = [], 0
+        for deal in self.deduplicate(priced):
+            cost = len(deal.describe()) // 4
+            if len(selected) >= self.max_deals or (selected and tokens + cost > self.token_budget):
+                break
+            selected.append(deal)
+            tokens += cost
+        return selected
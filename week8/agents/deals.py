@@ -5,7 +5,14 @@ import re
 import feedparser
 from tqdm import tqdm
 import requests
+import os
+import json
 import time
+import logging
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
 feeds = [
     "https://www.dealnews.com/c142/Electronics/?rss=1",
@@ -31,6 +38,105 @@ def extract(html_snippet: str) -> str:
         result = html_snippet
     return result.replace('\n', ' ')
 
+class HostThrottle:
+    """
+    Keep our scraping polite: limit how many requests are in flight to each host at once,
+    and leave a minimum gap between starting requests to the same host
+    """
+
+    def __init__(self, per_host: int = 2, interval: float = 0.5):
+        self.per_host = per_host
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.semaphores = {}
+        self.next_start = {}
+
+    def get(self, session: requests.Session, url: str, timeout: float, headers: Dict[str, str] = None) -> requests.Response:
+        host = urlparse(url).netloc
+        with self.lock:
+            semaphore = self.semaphores.setdefault(host, threading.Semaphore(self.per_host))
+        with semaphore:
+            with self.lock:
+                now = time.monotonic()
+                start = max(now, self.next_start.get(host, now))
+                self.next_start[host] = start + self.interval
+            time.sleep(start - now)
+            response = session.get(url, timeout=timeout, headers=headers)
+            response.raise_for_status()
+            return response
+
+
+class ScrapeCache:
+    """
+    A cache for the scraper: the ETag and Last-Modified of each RSS feed, so that we can make conditional GETs
+    and reuse the feed we already have if the server says it's not modified; and the text parsed out of each
+    deal page, so that pages we've seen in the last ttl seconds are never downloaded or parsed again
+    If a path is given, the cache is saved there as JSON so it survives restarts
+    """
+
+    def __init__(self, path: str = None, ttl: float = 24 * 60 * 60):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.feeds = {}
+        self.pages = {}
+        if path and os.path.exists(path):
+            with open(path, "r") as file:
+                data = json.load(file)
+            self.feeds, self.pages = data["feeds"], data["pages"]
+
+    def feed_headers(self, url: str) -> Dict[str, str]:
+        """
+        Return the headers to make a conditional GET for this feed
+        """
+        cached = self.feeds.get(url, {})
+        headers = {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+
+    def feed(self, url: str, response: requests.Response) -> str:
+        """
+        Return the body of this feed, either from the response or from the cache if the server said it's not modified
+        """
+        if response.status_code == 304 and url in self.feeds:
+            return self.feeds[url]["content"]
+        with self.lock:
+            self.feeds[url] = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified"), "content": response.text}
+        return response.text
+
+    def page(self, url: str) -> str:
+        """
+        Return the text parsed from this deal page, or None if we don't have it or it has expired
+        """
+        cached = self.pages.get(url)
+        if cached and time.time() - cached["fetched"] < self.ttl:
+            return cached["content"]
+        return None
+
+    def store_page(self, url: str, content: str):
+        with self.lock:
+            self.pages[url] = {"fetched": time.time(), "content": content}
+
+    def save(self):
+        """
+        Drop expired pages, then write the cache to disk if it has a path
+        """
+        with self.lock:
+            now = time.time()
+            self.pages = {url: cached for url, cached in self.pages.items() if now - cached["fetched"] < self.ttl}
+            if self.path:
+                with open(self.path, "w") as file:
+                    json.dump({"feeds": self.feeds, "pages": self.pages}, file)
+
+
+# Shared by every fetch in this process, so that each scan only downloads what's new
+
+scrape_cache = ScrapeCache()
+
+
 class ScrapedDeal:
     """
     A class to represent a Deal retrieved from an RSS feed
@@ -42,23 +148,32 @@ class ScrapedDeal:
     details: str
     features: str
 
-    def __init__(self, entry: Dict[str, str]):
+    def __init__(self, entry: Dict[str, str], page: bytes = None, content: str = None):
         """
         Populate this instance based on the provided dict
+        The deal's page is downloaded and parsed, unless its contents or the text already parsed from it are passed in
         """
         self.title = entry['title']
         self.summary = extract(entry['summary'])
         self.url = entry['links'][0]['href']
-        stuff = requests.get(self.url).content
-        soup = BeautifulSoup(stuff, 'html.parser')
-        content = soup.find('div', class_='content-section').get_text()
-        content = content.replace('\nmore', '').replace('\n', ' ')
+        if content is None:
+            stuff = page if page is not None else requests.get(self.url).content
+            content = self.page_text(stuff)
         if "Features" in content:
             self.details, self.features = content.split("Features")
         else:
             self.details = content
             self.features = ""
 
+    @staticmethod
+    def page_text(page: bytes) -> str:
+        """
+        Parse the text of the deal out of its web page
+        """
+        soup = BeautifulSoup(page, 'html.parser')
+        content = soup.find('div', class_='content-section').get_text()
+        return content.replace('\nmore', '').replace('\n', ' ')
+
     def __repr__(self):
         """
         Return a string to describe this deal
@@ -72,17 +187,67 @@ class ScrapedDeal:
         return f"Title: {self.title}\nDetails: {self.details.strip()}\nFeatures: {self.features.strip()}\nURL: {self.url}"
 
     @classmethod
-    def fetch(cls, show_progress : bool = False) -> List[Self]:
+    def fetch(cls, show_progress : bool = False, workers: int = 8, per_host: int = 2, interval: float = 0.5, timeout: float = 10, cache: ScrapeCache = scrape_cache) -> List[Self]:
         """
         Retrieve all deals from the selected RSS feeds
+        The feeds and then the deal pages are downloaded concurrently over a shared connection pool,
+        with no more than per_host requests to each host at a time, at least interval seconds apart -
+        by default that's no faster than the one request every half a second that we used to make.
+        Feeds are fetched with conditional GETs and pages already in the cache aren't fetched again.
+        Pages that fail to download or parse are skipped, and the time for each feed and page is logged
         """
-        deals = []
-        feed_iter = tqdm(feeds) if show_progress else feeds
-        for feed_url in feed_iter:
-            feed = feedparser.parse(feed_url)
-            for entry in feed.entries[:10]:
-                deals.append(cls(entry))
-                time.sleep(0.5)
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(feeds), pool_maxsize=workers)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        throttle = HostThrottle(per_host, interval)
+
+        def timed_get(url, headers=None):
+            start = time.perf_counter()
+            response = throttle.get(session, url, timeout, headers)
+            return response, time.perf_counter() - start
+
+        def fetch_feed(feed_url):
+            try:
+                response, elapsed = timed_get(feed_url, cache.feed_headers(feed_url))
+                content = cache.feed(feed_url, response)
+            except Exception as e:
+                logging.warning(f"Skipping RSS feed {feed_url}: {e}")
+                return []
+            status = "not modified" if response.status_code == 304 else "fetched"
+            logging.info(f"RSS feed {feed_url} {status} in {elapsed:.2f}s")
+            return feedparser.parse(content).entries[:10]
+
+        def fetch_deal(entry):
+            url = entry['links'][0]['href']
+            try:
+                content = cache.page(url)
+                if content is not None:
+                    logging.debug(f"Deal page {url} found in cache")
+                    return cls(entry, content=content), None
+                response, elapsed = timed_get(url)
+                content = cls.page_text(response.content)
+                deal = cls(entry, content=content)
+                cache.store_page(url, content)
+                logging.info(f"Deal page {url} fetched in {elapsed:.2f}s")
+                return deal, elapsed
+            except Exception as e:
+                logging.warning(f"Skipping deal {url}: {e}")
+                return None, 0.0
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            entries = [entry for feed_entries in pool.map(fetch_feed, feeds) for entry in feed_entries]
+            results = pool.map(fetch_deal, entries)
+            results = list(tqdm(results, total=len(entries)) if show_progress else results)
+        session.close()
+        cache.save()
+        deals = [deal for deal, _ in results if deal]
+        page_times = [elapsed for deal, elapsed in results if deal and elapsed is not None]
+        summary = f"Fetched {len(deals)} deals in {time.perf_counter() - start:.2f}s - {len(deals) - len(page_times)} pages from cache"
+        if page_times:
+            summary += f", {len(page_times)} downloaded at an average of {sum(page_times)/len(page_times):.2f}s, slowest {max(page_times):.2f}s"
+        logging.info(summary)
         return deals
 
 class Deal(BaseModel):
@@ -0,0 +1,79 @@
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+
+class Embedder:
+    """
+    A vector encoding service shared by the agents: one SentenceTransformer model for the whole process,
+    with an in-memory LRU cache and a SQLite cache on disk, both keyed by a hash of the text
+    Use Embedder.shared() to get the single instance
+    """
+
+    MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+    instance = None
+    instance_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "Embedder":
+        with cls.instance_lock:
+            if cls.instance is None:
+                cls.instance = cls()
+            return cls.instance
+
+    def __init__(self, cache_path: str = "embeddings.db", lru_size: int = 10_000):
+        self.model = SentenceTransformer(self.MODEL)
+        self.lru_size = lru_size
+        self.lru = OrderedDict()
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(cache_path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS embeddings (model TEXT, text_hash TEXT, vector BLOB, PRIMARY KEY (model, text_hash))")
+        self.connection.commit()
+
+    @staticmethod
+    def hash_for(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def remember(self, key: str, vector: np.ndarray) -> None:
+        self.lru[key] = vector
+        self.lru.move_to_end(key)
+        if len(self.lru) > self.lru_size:
+            self.lru.popitem(last=False)
+
+    def lookup(self, key: str):
+        """
+        Return the cached vector for this hash from memory or disk, or None
+        """
+        if key in self.lru:
+            self.lru.move_to_end(key)
+            return self.lru[key]
+        row = self.connection.execute("SELECT vector FROM embeddings WHERE model = ? AND text_hash = ?", (self.MODEL, key)).fetchone()
+        if row:
+            vector = np.frombuffer(row[0], dtype=np.float32)
+            self.remember(key, vector)
+            return vector
+        return None
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Return the vectors for these texts as a 2D float32 array, like SentenceTransformer.encode;
+        only texts that aren't already cached are encoded, all together in one batch
+        This is done under a lock, so that two agents asking for the same text at once only encode it once
+        """
+        keys = [self.hash_for(text) for text in texts]
+        with self.lock:
+            vectors = {key: self.lookup(key) for key in set(keys)}
+            missing = {key: text for key, text in zip(keys, texts) if vectors[key] is None}
+            if missing:
+                encoded = self.model.encode(list(missing.values())).astype(np.float32)
+                for key, vector in zip(missing.keys(), encoded):
+                    vectors[key] = vector
+                    self.remember(key, vector)
+                self.connection.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", [(self.MODEL, key, vectors[key].tobytes()) for key in missing])
+                self.connection.commit()
+        return np.stack([vectors[key] for key in keys]) if keys else np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
@@ -1,3 +1,6 @@
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 from sklearn.linear_model import LinearRegression
 import joblib
@@ -12,15 +15,15 @@ class EnsembleAgent(Agent):
     name = "Ensemble Agent"
     color = Agent.YELLOW
     
-    def __init__(self, collection):
+    def __init__(self, collection, specialist: SpecialistAgent = None, frontier: FrontierAgent = None, random_forest: RandomForestAgent = None):
         """
-        Create an instance of Ensemble, by creating each of the models
+        Create an instance of Ensemble, by creating each of the models - unless they're provided already loaded -
         And loading the weights of the Ensemble
         """
         self.log("Initializing Ensemble Agent")
-        self.specialist = SpecialistAgent()
-        self.frontier = FrontierAgent(collection)
-        self.random_forest = RandomForestAgent()
+        self.specialist = specialist or SpecialistAgent()
+        self.frontier = frontier or FrontierAgent(collection)
+        self.random_forest = random_forest or RandomForestAgent()
         self.model = joblib.load('ensemble_model.pkl')
         self.log("Ensemble Agent is ready")
 
@@ -32,17 +35,32 @@ class EnsembleAgent(Agent):
         :param description: the description of a product
         :return: an estimate of its price
         """
-        self.log("Running Ensemble Agent - collaborating with specialist, frontier and random forest agents")
-        specialist = self.specialist.price(description)
-        frontier = self.frontier.price(description)
-        random_forest = self.random_forest.price(description)
+        return self.price_many([description])[0]
+
+    def price_many(self, descriptions: List[str]) -> List[float]:
+        """
+        Run this ensemble model on several products at once
+        The specialist, frontier and random forest models run concurrently, each pricing all of the products as a batch,
+        then the Linear Regression model weights all of their estimates in a single call,
+        given as a DataFrame with the same columns it was trained on: Specialist, Frontier, RandomForest, Min, Max
+        :param descriptions: the descriptions of the products
+        :return: an estimate of each price, in the same order
+        """
+        if not descriptions:
+            return []
+        self.log(f"Running Ensemble Agent on {len(descriptions)} products - collaborating with specialist, frontier and random forest agents")
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            specialist = pool.submit(self.specialist.price_many, descriptions)
+            frontier = pool.submit(self.frontier.price_many, descriptions)
+            random_forest = pool.submit(self.random_forest.price_many, descriptions)
+            estimates = np.column_stack([specialist.result(), frontier.result(), random_forest.result()])
         X = pd.DataFrame({
-            'Specialist': [specialist],
-            'Frontier': [frontier],
-            'RandomForest': [random_forest],
-            'Min': [min(specialist, frontier, random_forest)],
-            'Max': [max(specialist, frontier, random_forest)],
+            'Specialist': estimates[:, 0],
+            'Frontier': estimates[:, 1],
+            'RandomForest': estimates[:, 2],
+            'Min': estimates.min(axis=1),
+            'Max': estimates.max(axis=1),
         })
-        y = max(0, self.model.predict(X)[0])
-        self.log(f"Ensemble Agent complete - returning ${y:.2f}")
-        return y
\ No newline at end of file
+        results = [max(0, float(y)) for y in self.model.predict(X)]
+        self.log("Ensemble Agent complete - returning " + ", ".join(f"${y:.2f}" for y in results))
+        return results
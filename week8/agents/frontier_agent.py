@@ -5,13 +5,16 @@ import re
 import math
 import json
 from typing import List, Dict
-from openai import OpenAI
-from sentence_transformers import SentenceTransformer
+from concurrent.futures import ThreadPoolExecutor
 from datasets import load_dataset
 import chromadb
 from items import Item
 from testing import Tester
 from agents.agent import Agent
+from agents.embeddings import Embedder
+from agents.similarity_index import SimilarityIndex
+from agents.llm_client import LLMClient
+from agents.response_cache import ResponseCache
 
 
 class FrontierAgent(Agent):
@@ -20,24 +23,30 @@ class FrontierAgent(Agent):
     color = Agent.BLUE
 
     MODEL = "gpt-4o-mini"
+    INDEX_DIR = "products_index"
+    CACHE_PATH = "responses.db"
     
     def __init__(self, collection):
         """
         Set up this instance by connecting to OpenAI or DeepSeek, to the Chroma Datastore,
         And setting up the vector encoding model
+        With DeepSeek, calls that are slow to answer are hedged with gpt-4o-mini
         """
         self.log("Initializing Frontier Agent")
         deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
         if deepseek_api_key:
-            self.client = OpenAI(api_key=deepseek_api_key, base_url="https://api.deepseek.com")
             self.MODEL = "deepseek-chat"
+            self.client = LLMClient(self.MODEL, api_key=deepseek_api_key, base_url="https://api.deepseek.com", fallback_model="gpt-4o-mini")
             self.log("Frontier Agent is set up with DeepSeek")
         else:
-            self.client = OpenAI()
             self.MODEL = "gpt-4o-mini"
+            self.client = LLMClient(self.MODEL)
             self.log("Frontier Agent is setting up with OpenAI")
         self.collection = collection
-        self.model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+        self.log("Frontier Agent is loading the similarity index of the Chroma datastore")
+        self.index = SimilarityIndex.load_or_build(collection, self.INDEX_DIR)
+        self.embedder = Embedder.shared()
+        self.cache = ResponseCache(self.CACHE_PATH)
         self.log("Frontier Agent is ready")
 
     def make_context(self, similars: List[str], prices: List[float]) -> str:
@@ -73,13 +82,21 @@ class FrontierAgent(Agent):
 
     def find_similars(self, description: str):
         """
-        Return a list of items similar to the given one by looking in the Chroma datastore
+        Return a list of items similar to the given one by searching the index of the Chroma datastore
         """
         self.log("Frontier Agent is performing a RAG search of the Chroma datastore to find 5 similar products")
-        vector = self.model.encode([description])
-        results = self.collection.query(query_embeddings=vector.astype(float).tolist(), n_results=5)
-        documents = results['documents'][0][:]
-        prices = [m['price'] for m in results['metadatas'][0][:]]
+        vector = self.embedder.encode([description])
+        documents, prices = self.index.search(vector, 5)
+        self.log("Frontier Agent has found similar products")
+        return documents[0], prices[0]
+
+    def find_similars_many(self, descriptions: List[str]):
+        """
+        Return the similar items for each of these descriptions, encoding and searching them in a single batch
+        """
+        self.log(f"Frontier Agent is performing a RAG search of the Chroma datastore for {len(descriptions)} products")
+        vectors = self.embedder.encode(descriptions)
+        documents, prices = self.index.search(vectors, 5)
         self.log("Frontier Agent has found similar products")
         return documents, prices
 
@@ -99,15 +116,42 @@ class FrontierAgent(Agent):
         :return: an estimate of the price
         """
         documents, prices = self.find_similars(description)
+        return self.call_model(description, documents, prices)
+
+    def call_model(self, description: str, documents: List[str], prices: List[float]) -> float:
+        """
+        Ask the model to estimate the price of this product, given the similar products as context
+        The call is deterministic, so the price is taken from the response cache if this exact prompt has been priced before
+        Only prices from self.MODEL are cached - not ones from a hedged fallback - and only if a price was found in the reply
+        """
+        messages = self.messages_for(description, documents, prices)
+        cached = self.cache.get(self.MODEL, messages)
+        if cached is not None:
+            self.log(f"Frontier Agent found this prompt in the response cache - predicting ${cached:.2f}; cache {self.cache.stats()}")
+            return cached
         self.log(f"Frontier Agent is about to call {self.MODEL} with context including 5 similar products")
-        response = self.client.chat.completions.create(
-            model=self.MODEL, 
-            messages=self.messages_for(description, documents, prices),
+        model, response = self.client.create_with_model(
+            messages=messages,
             seed=42,
             max_tokens=5
         )
         reply = response.choices[0].message.content
         result = self.get_price(reply)
-        self.log(f"Frontier Agent completed - predicting ${result:.2f}")
+        if result > 0 and model == self.MODEL:
+            self.cache.put(self.MODEL, messages, result)
+        elif result <= 0:
+            self.log(f"Frontier Agent couldn't find a price in the reply {reply!r}, so it isn't cached")
+        self.log(f"Frontier Agent completed - predicting ${result:.2f}; cache {self.cache.stats()}")
         return result
+
+    def price_many(self, descriptions: List[str]) -> List[float]:
+        """
+        Estimate the prices of several products: the RAG search is done as one batch,
+        then the calls to the model are made concurrently
+        :param descriptions: descriptions of the products
+        :return: the estimates, in the same order
+        """
+        all_documents, all_prices = self.find_similars_many(descriptions)
+        with ThreadPoolExecutor(max_workers=len(descriptions) or 1) as pool:
+            return list(pool.map(self.call_model, descriptions, all_documents, all_prices))
         
\ No newline at end of file
@@ -0,0 +1,156 @@
+import asyncio
+import random
+import logging
+import threading
+from typing import Optional, Dict, Any, Tuple
+from openai import AsyncOpenAI, APIStatusError, APIConnectionError, APITimeoutError
+
+
+class LLMClient:
+    """
+    A client for OpenAI-compatible chat models, shared by the agents that call frontier models
+    - One AsyncOpenAI client per endpoint, so connections are pooled and reused across calls
+    - At most max_concurrency calls are in flight at once
+    - Rate limits (429), server errors (5xx), timeouts and connection errors are retried with exponential backoff
+    - Every call has a deadline, covering all of its retries
+    - If a fallback model is given, and the primary hasn't answered after hedge_after seconds,
+      the same request is also sent to the fallback and whichever answers first is used
+    The calls run on a background event loop, so they can be made from ordinary (and multi-threaded) code
+    with create() and parse(), or awaited from async code with acreate() and aparse()
+    """
+
+    loop = None
+    loop_lock = threading.Lock()
+
+    def __init__(self, model: str, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 fallback_model: Optional[str] = None, fallback_api_key: Optional[str] = None, fallback_base_url: Optional[str] = None,
+                 max_concurrency: int = 8, retries: int = 4, timeout: float = 20, deadline: float = 60, hedge_after: float = 10):
+        self.model = model
+        self.fallback_model = fallback_model
+        self.endpoints = {model: {"api_key": api_key, "base_url": base_url}}
+        if fallback_model:
+            self.endpoints[fallback_model] = {"api_key": fallback_api_key, "base_url": fallback_base_url}
+        self.clients = {}
+        self.max_concurrency = max_concurrency
+        self.semaphore = None
+        self.retries = retries
+        self.timeout = timeout
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+
+    @classmethod
+    def event_loop(cls) -> asyncio.AbstractEventLoop:
+        """
+        Return the background event loop shared by every LLMClient, starting it on first use
+        """
+        with cls.loop_lock:
+            if cls.loop is None:
+                cls.loop = asyncio.new_event_loop()
+                threading.Thread(target=cls.loop.run_forever, name="llm-client", daemon=True).start()
+            return cls.loop
+
+    def client_for(self, model: str) -> AsyncOpenAI:
+        """
+        Return the AsyncOpenAI client for this model's endpoint; it's created on the event loop on first use
+        Retries are switched off in the client, as they're handled here
+        """
+        if model not in self.clients:
+            self.clients[model] = AsyncOpenAI(max_retries=0, timeout=self.timeout, **{k: v for k, v in self.endpoints[model].items() if v})
+        return self.clients[model]
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        if isinstance(error, (APIConnectionError, APITimeoutError)):
+            return True
+        return isinstance(error, APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+    @staticmethod
+    def retry_after(error: Exception) -> Optional[float]:
+        try:
+            return float(error.response.headers.get("retry-after"))
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    async def attempt(self, model: str, kind: str, kwargs: Dict[str, Any]) -> Tuple[str, Any]:
+        """
+        Make the call to this model, retrying with exponential backoff if it fails in a way that might succeed next time
+        :return: the model, and its response
+        """
+        client = self.client_for(model)
+        method = client.beta.chat.completions.parse if kind == "parse" else client.chat.completions.create
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.semaphore:
+                    return model, await method(model=model, **kwargs)
+            except Exception as error:
+                if attempt == self.retries or not self.is_retryable(error):
+                    raise
+                delay = self.retry_after(error) or (0.5 * 2 ** attempt + random.random() * 0.5)
+                logging.warning(f"Call to {model} failed with {type(error).__name__}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def hedged(self, kind: str, kwargs: Dict[str, Any]):
+        """
+        Call the primary model; if there's a fallback and the primary is slow, race the fallback against it
+        If one of them fails, the other one's answer is still used
+        :return: the model that answered, and its response
+        """
+        primary = asyncio.ensure_future(self.attempt(self.model, kind, kwargs))
+        if not self.fallback_model:
+            return await primary
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        if done and not primary.exception():
+            return primary.result()
+        logging.warning(f"{self.model} is slow or failing, hedging with {self.fallback_model}")
+        tasks = {primary, asyncio.ensure_future(self.attempt(self.fallback_model, kind, kwargs))}
+        error = None
+        try:
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def submit(self, kind: str, kwargs: Dict[str, Any]):
+        """
+        Schedule the call on the background event loop, where the clients live, with its deadline
+        """
+        coroutine = asyncio.wait_for(self.hedged(kind, kwargs), self.deadline)
+        return asyncio.run_coroutine_threadsafe(coroutine, self.event_loop())
+
+    async def acreate(self, **kwargs):
+        """
+        The equivalent of await chat.completions.create(**kwargs), without the model
+        """
+        _, response = await asyncio.wrap_future(self.submit("create", kwargs))
+        return response
+
+    async def aparse(self, **kwargs):
+        """
+        The equivalent of await beta.chat.completions.parse(**kwargs), without the model
+        """
+        _, response = await asyncio.wrap_future(self.submit("parse", kwargs))
+        return response
+
+    def create(self, **kwargs):
+        return self.create_with_model(**kwargs)[1]
+
+    def create_with_model(self, **kwargs) -> Tuple[str, Any]:
+        """
+        Like create(), but also return which model answered - the fallback, if the call was hedged and it won
+        """
+        return self.submit("create", kwargs).result()
+
+    def parse(self, **kwargs):
+        return self.submit("parse", kwargs).result()[1]
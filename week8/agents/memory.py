@@ -0,0 +1,118 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import List, Optional, Iterator
+from agents.deals import Opportunity
+
+
+class OpportunityMemory:
+    """
+    The Opportunities surfaced so far, kept in an append-only JSON Lines file
+    Each new Opportunity is written as one line, rather than rewriting the whole file,
+    and an index of URLs makes checking whether a deal has been seen before O(1)
+    It behaves like a list of Opportunities, so it can be used anywhere the memory list was used before
+    """
+
+    def __init__(self, filename: str = "memory.jsonl", legacy_filename: Optional[str] = "memory.json"):
+        """
+        Load the memory from filename; if it doesn't exist yet but a memory.json list from
+        an earlier version does, then that's converted to the new format
+        """
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.opportunities: List[Opportunity] = []
+        self.timestamps: List[Optional[float]] = []
+        self.urls = set()
+        self.lines = 0
+        if os.path.exists(filename):
+            if not self.read():
+                self.compact()
+        elif legacy_filename and os.path.exists(legacy_filename):
+            with open(legacy_filename, "r") as file:
+                data = json.load(file)
+            for item in data:
+                self.add(Opportunity(**item), None)
+            self.compact()
+
+    def add(self, opportunity: Opportunity, timestamp: Optional[float]) -> None:
+        self.opportunities.append(opportunity)
+        self.timestamps.append(timestamp)
+        self.urls.add(opportunity.deal.url)
+
+    def read(self) -> bool:
+        """
+        Read every line of the file; if a URL appears more than once, the latest entry wins
+        A line that can't be parsed - usually the last one, torn by a crash part way through append - is skipped
+        :return: True if every line was read, False if any were skipped and the file should be compacted
+        """
+        latest = {}
+        clean = True
+        with open(self.filename, "r") as file:
+            for number, line in enumerate(file, start=1):
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                        url = record["opportunity"]["deal"]["url"]
+                    except (ValueError, KeyError, TypeError) as e:
+                        logging.warning(f"Skipping unreadable line {number} of {self.filename}: {e}")
+                        clean = False
+                        continue
+                    latest.pop(url, None)
+                    latest[url] = record
+                    self.lines += 1
+        for record in latest.values():
+            self.add(Opportunity(**record["opportunity"]), record["timestamp"])
+        return clean
+
+    def append(self, opportunity: Opportunity) -> None:
+        """
+        Add this Opportunity to memory, writing just one new line to the file
+        """
+        with self.lock:
+            timestamp = time.time()
+            if opportunity.deal.url in self.urls:
+                index = next(i for i, opp in enumerate(self.opportunities) if opp.deal.url == opportunity.deal.url)
+                del self.opportunities[index], self.timestamps[index]
+            self.add(opportunity, timestamp)
+            with open(self.filename, "a") as file:
+                file.write(json.dumps({"timestamp": timestamp, "opportunity": opportunity.dict()}) + "\n")
+            self.lines += 1
+            if self.lines > 2 * len(self.opportunities) + 100:
+                self.write()
+
+    def write(self) -> None:
+        """
+        Rewrite the file with one line per Opportunity, dropping replaced entries;
+        it's written to a temporary file and renamed, so the memory is never left half-written
+        """
+        with open(self.filename + ".tmp", "w") as file:
+            for opportunity, timestamp in zip(self.opportunities, self.timestamps):
+                file.write(json.dumps({"timestamp": timestamp, "opportunity": opportunity.dict()}) + "\n")
+        os.replace(self.filename + ".tmp", self.filename)
+        self.lines = len(self.opportunities)
+
+    def compact(self) -> None:
+        with self.lock:
+            self.write()
+
+    def contains_url(self, url: str) -> bool:
+        return url in self.urls
+
+    def since(self, seconds: float) -> List[Opportunity]:
+        """
+        Return the Opportunities surfaced in the last number of seconds
+        Ones converted from memory.json have no timestamp, so they're never included
+        """
+        cutoff = time.time() - seconds
+        return [opp for opp, timestamp in zip(self.opportunities, self.timestamps) if timestamp is not None and timestamp >= cutoff]
+
+    def __len__(self) -> int:
+        return len(self.opportunities)
+
+    def __getitem__(self, index):
+        return self.opportunities[index]
+
+    def __iter__(self) -> Iterator[Opportunity]:
+        return iter(self.opportunities)
@@ -1,4 +1,7 @@
+import time
+import asyncio
 from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor
 from agents.agent import Agent
 from agents.deals import ScrapedDeal, DealSelection, Deal, Opportunity
 from agents.scanner_agent import ScannerAgent
@@ -12,14 +15,15 @@ class PlanningAgent(Agent):
     color = Agent.GREEN
     DEAL_THRESHOLD = 50
 
-    def __init__(self, collection):
+    def __init__(self, collection, scanner: ScannerAgent = None, ensemble: EnsembleAgent = None, messenger: MessagingAgent = None):
         """
-        Create instances of the 3 Agents that this planner coordinates across
+        Create instances of the 3 Agents that this planner coordinates across, unless they're provided already loaded
         """
         self.log("Planning Agent is initializing")
-        self.scanner = ScannerAgent()
-        self.ensemble = EnsembleAgent(collection)
-        self.messenger = MessagingAgent()
+        self.scanner = scanner or ScannerAgent()
+        self.ensemble = ensemble or EnsembleAgent(collection)
+        self.messenger = messenger or MessagingAgent()
+        self.timings = {}
         self.log("Planning Agent is ready")
 
     def run(self, deal: Deal) -> Opportunity:
@@ -34,24 +38,88 @@ class PlanningAgent(Agent):
         self.log(f"Planning Agent has processed a deal with discount ${discount:.2f}")
         return Opportunity(deal=deal, estimate=estimate, discount=discount)
 
-    def plan(self, memory: List[str] = []) -> Optional[Opportunity]:
+    def run_many(self, deals: List[Deal]) -> List[Opportunity]:
+        """
+        Run the workflow for several deals, pricing them all in one batch
+        :param deals: the deals, summarized from an RSS scrape
+        :returns: an opportunity for each deal, in the same order
         """
-        Run the full workflow:
-        1. Use the ScannerAgent to find deals from RSS feeds
-        2. Use the EnsembleAgent to estimate them
-        3. Use the MessagingAgent to send a notification of deals
+        self.log(f"Planning Agent is pricing up {len(deals)} potential deals")
+        estimates = self.ensemble.price_many([deal.product_description for deal in deals])
+        opportunities = [Opportunity(deal=deal, estimate=estimate, discount=estimate - deal.price) for deal, estimate in zip(deals, estimates)]
+        self.log("Planning Agent has processed deals with discounts " + ", ".join(f"${opp.discount:.2f}" for opp in opportunities))
+        return opportunities
+
+    async def pipeline(self, memory: List[str] = []) -> List[Opportunity]:
+        """
+        Run the full workflow so that each deal moves on as soon as it's ready, rather than stage by stage:
+        1. The ScannerAgent finds deals from RSS feeds
+        2. Each deal is priced by the EnsembleAgent in its own task, all of them at once
+        3. The MessagingAgent alerts on each opportunity with a discount over DEAL_THRESHOLD as soon as it's priced,
+           while the other deals are still being priced
+        The agents block, so their calls are run in threads. self.timings keeps the scanning time, the time to price
+        each deal and to send each alert, the time from the start to the first alert, and the total
         :param memory: a list of URLs that have been surfaced in the past
-        :return: an Opportunity if one was surfaced, otherwise None
+        :return: the opportunities that were alerted, in the order they were alerted
         """
         self.log("Planning Agent is kicking off a run")
-        selection = self.scanner.scan(memory=memory)
-        if selection:
-            opportunities = [self.run(deal) for deal in selection.deals[:5]]
-            opportunities.sort(key=lambda opp: opp.discount, reverse=True)
-            best = opportunities[0]
-            self.log(f"Planning Agent has identified the best deal has discount ${best.discount:.2f}")
-            if best.discount > self.DEAL_THRESHOLD:
-                self.messenger.alert(best)
-            self.log("Planning Agent has completed a run")
-            return best if best.discount > self.DEAL_THRESHOLD else None
-        return None
\ No newline at end of file
+        start = time.perf_counter()
+        timings = {"pricing": [], "alerting": []}
+        alerted = []
+
+        selection = await asyncio.to_thread(self.scanner.scan, memory)
+        timings["scanning"] = time.perf_counter() - start
+
+        async def price(deal: Deal) -> Opportunity:
+            began = time.perf_counter()
+            opportunity = await asyncio.to_thread(self.run, deal)
+            timings["pricing"].append(time.perf_counter() - began)
+            return opportunity
+
+        for pricing in asyncio.as_completed([price(deal) for deal in (selection.deals[:5] if selection else [])]):
+            opportunity = await pricing
+            if opportunity.discount > self.DEAL_THRESHOLD:
+                began = time.perf_counter()
+                await asyncio.to_thread(self.messenger.alert, opportunity)
+                timings["alerting"].append(time.perf_counter() - began)
+                timings.setdefault("first_alert", time.perf_counter() - start)
+                alerted.append(opportunity)
+                self.log(f"Planning Agent alerted on a deal with discount ${opportunity.discount:.2f}")
+
+        timings["total"] = time.perf_counter() - start
+        self.timings = timings
+        self.log_timings()
+        self.log("Planning Agent has completed a run")
+        return alerted
+
+    def log_timings(self) -> None:
+        timings = self.timings
+        message = f"Planning Agent timings: scanning {timings.get('scanning', 0):.1f}s"
+        if timings["pricing"]:
+            message += f", pricing {sum(timings['pricing'])/len(timings['pricing']):.1f}s per deal (slowest {max(timings['pricing']):.1f}s)"
+        if timings["alerting"]:
+            message += f", alerting {sum(timings['alerting'])/len(timings['alerting']):.1f}s per alert"
+        if "first_alert" in timings:
+            message += f", first alert after {timings['first_alert']:.1f}s"
+        self.log(message + f", total {timings['total']:.1f}s")
+
+    def surface(self, memory: List[str] = []) -> List[Opportunity]:
+        """
+        Run the pipeline and return the opportunities that were alerted
+        If this thread already has an event loop running, as in a notebook, the pipeline runs on a new one in another thread
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.pipeline(memory))
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, self.pipeline(memory)).result()
+
+    def plan(self, memory: List[str] = []) -> Optional[Opportunity]:
+        """
+        Run the full workflow, alerting on every opportunity with a discount over DEAL_THRESHOLD
+        :param memory: a list of URLs that have been surfaced in the past
+        :return: the best Opportunity that was surfaced, otherwise None
+        """
+        surfaced = self.surface(memory)
+        return max(surfaced, key=lambda opp: opp.discount) if surfaced else None
@@ -3,9 +3,9 @@
 import os
 import re
 from typing import List
-from sentence_transformers import SentenceTransformer
 import joblib
 from agents.agent import Agent
+from agents.embeddings import Embedder
 
 
 
@@ -17,10 +17,10 @@ class RandomForestAgent(Agent):
     def __init__(self):
         """
         Initialize this object by loading in the saved model weights
-        and the SentenceTransformer vector encoding model
+        and the shared vector encoding model
         """
         self.log("Random Forest Agent is initializing")
-        self.vectorizer = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+        self.vectorizer = Embedder.shared()
         self.model = joblib.load('random_forest_model.pkl')
         self.log("Random Forest Agent is ready")
 
@@ -34,4 +34,16 @@ class RandomForestAgent(Agent):
         vector = self.vectorizer.encode([description])
         result = max(0, self.model.predict(vector)[0])
         self.log(f"Random Forest Agent completed - predicting ${result:.2f}")
-        return result
\ No newline at end of file
+        return result
+
+    def price_many(self, descriptions: List[str]) -> List[float]:
+        """
+        Estimate the prices of several products, encoding them and running the model in a single batch
+        :param descriptions: the products to be estimated
+        :return: the prices, in the same order
+        """
+        self.log(f"Random Forest Agent is starting predictions for {len(descriptions)} products")
+        vectors = self.vectorizer.encode(descriptions)
+        results = [max(0, float(p)) for p in self.model.predict(vectors)]
+        self.log("Random Forest Agent completed - predicting " + ", ".join(f"${r:.2f}" for r in results))
+        return results
\ No newline at end of file
@@ -0,0 +1,75 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import List, Dict, Optional
+
+
+class ResponseCache:
+    """
+    A persistent cache of the prices given by a model, in a SQLite file, so the same prompt isn't paid for twice
+    Prices are keyed by the model name and a hash of the whole message list, so any change to the prompt or its
+    RAG context is a miss; entries expire after ttl seconds, and the least recently used are evicted beyond max_entries
+    """
+
+    def __init__(self, path: str = "responses.db", ttl: float = 7 * 24 * 60 * 60, max_entries: int = 10_000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS responses (model TEXT, prompt_hash TEXT, price REAL, created REAL, used REAL, PRIMARY KEY (model, prompt_hash))")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used)")
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def hash_for(messages: List[Dict[str, str]]) -> str:
+        """
+        Hash the messages with runs of whitespace collapsed, so descriptions that differ only in spacing share an entry
+        """
+        normalized = [{key: " ".join(value.split()) for key, value in message.items()} for message in messages]
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, model: str, messages: List[Dict[str, str]]) -> Optional[float]:
+        """
+        Return the cached price for this prompt to this model, or None if there isn't one or it has expired
+        """
+        key, now = self.hash_for(messages), time.time()
+        with self.lock:
+            row = self.connection.execute("SELECT price FROM responses WHERE model = ? AND prompt_hash = ? AND created > ?", (model, key, now - self.ttl)).fetchone()
+            if row:
+                self.hits += 1
+                self.connection.execute("UPDATE responses SET used = ? WHERE model = ? AND prompt_hash = ?", (now, model, key))
+                self.connection.commit()
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, model: str, messages: List[Dict[str, str]], price: float) -> None:
+        """
+        Store this price, then remove expired entries and the least recently used beyond max_entries
+        """
+        now = time.time()
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", (model, self.hash_for(messages), float(price), now, now))
+            self.connection.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl,))
+            self.connection.execute("DELETE FROM responses WHERE rowid IN (SELECT rowid FROM responses ORDER BY used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+            self.connection.commit()
+
+    def invalidate(self, model: Optional[str] = None) -> None:
+        """
+        Remove the cached prices for this model, or for every model if none is given
+        """
+        with self.lock:
+            if model is None:
+                self.connection.execute("DELETE FROM responses")
+            else:
+                self.connection.execute("DELETE FROM responses WHERE model = ?", (model,))
+            self.connection.commit()
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        return f"{self.hits:,} hits, {self.misses:,} misses ({self.hits/total*100 if total else 0:.1f}% hit rate)"
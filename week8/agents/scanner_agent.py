@@ -1,9 +1,11 @@
 import os
 import json
 from typing import Optional, List
-from openai import OpenAI
 from agents.deals import ScrapedDeal, DealSelection
+from agents.memory import OpportunityMemory
+from agents.deal_filter import DealFilter
 from agents.agent import Agent
+from agents.llm_client import LLMClient
 
 
 class ScannerAgent(Agent):
@@ -43,7 +45,8 @@ class ScannerAgent(Agent):
         Set up this instance by initializing OpenAI
         """
         self.log("Scanner Agent is initializing")
-        self.openai = OpenAI()
+        self.client = LLMClient(self.MODEL)
+        self.deal_filter = DealFilter()
         self.log("Scanner Agent is ready")
 
     def fetch_deals(self, memory) -> List[ScrapedDeal]:
@@ -52,10 +55,12 @@ class ScannerAgent(Agent):
         Return any new deals that are not already in the memory provided
         """
         self.log("Scanner Agent is about to fetch deals from RSS feed")
-        urls = [opp.deal.url for opp in memory]
+        urls = memory.urls if isinstance(memory, OpportunityMemory) else {opp.deal.url for opp in memory}
         scraped = ScrapedDeal.fetch()
         result = [scrape for scrape in scraped if scrape.url not in urls]
         self.log(f"Scanner Agent received {len(result)} deals not already scraped")
+        result = self.deal_filter.select(result)
+        self.log(f"Scanner Agent kept the {len(result)} most detailed deals with a price after removing duplicates")
         return result
 
     def make_user_prompt(self, scraped) -> str:
@@ -78,8 +83,7 @@ class ScannerAgent(Agent):
         if scraped:
             user_prompt = self.make_user_prompt(scraped)
             self.log("Scanner Agent is calling OpenAI using Structured Output")
-            result = self.openai.beta.chat.completions.parse(
-                model=self.MODEL,
+            result = self.client.parse(
                 messages=[
                     {"role": "system", "content": self.SYSTEM_PROMPT},
                     {"role": "user", "content": user_prompt}
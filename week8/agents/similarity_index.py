@@ -0,0 +1,124 @@
+import os
+import json
+from typing import List, Tuple
+import numpy as np
+
+
+class SimilarityIndex:
+    """
+    An in-process, exact nearest neighbour index over the products in the Chroma datastore,
+    so that the Frontier Agent can find similar products without a Chroma query for every description
+    The vectors are held in a NumPy matrix that's memory-mapped from disk once saved, and a search ranks every
+    product by L2 distance (the same measure as Chroma) with a single matrix multiply for a batch of queries
+    The index records the id of the collection it was made from, so a re-created collection isn't mistaken for it
+    """
+
+    def __init__(self, ids: List[str], vectors: np.ndarray, documents: List[str], prices: np.ndarray, collection: str = None):
+        self.collection = collection
+        self.ids = list(ids)
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        self.norms = (self.vectors ** 2).sum(axis=1)
+        self.documents = list(documents)
+        self.prices = np.asarray(prices, dtype=np.float64)
+
+    @staticmethod
+    def fetch(collection, offset: int = 0, batch_size: int = 10_000):
+        """
+        Read the ids, embeddings, documents and prices from a Chroma collection, starting at offset
+        """
+        ids, vectors, documents, prices = [], [], [], []
+        total = collection.count()
+        for start in range(offset, total, batch_size):
+            result = collection.get(include=['embeddings', 'documents', 'metadatas'], offset=start, limit=batch_size)
+            ids += result['ids']
+            vectors += list(result['embeddings'])
+            documents += result['documents']
+            prices += [metadata['price'] for metadata in result['metadatas']]
+        return ids, np.array(vectors, dtype=np.float32).reshape(len(ids), -1), documents, np.array(prices)
+
+    @classmethod
+    def from_collection(cls, collection) -> "SimilarityIndex":
+        return cls(*cls.fetch(collection), collection=str(collection.id))
+
+    @classmethod
+    def load(cls, directory: str) -> "SimilarityIndex":
+        """
+        Load an index written by save(); the vectors are memory-mapped rather than read into memory
+        """
+        index = cls.__new__(cls)
+        index.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        index.norms = np.load(os.path.join(directory, "norms.npy"))
+        index.prices = np.load(os.path.join(directory, "prices.npy"))
+        with open(os.path.join(directory, "documents.json"), "r") as file:
+            data = json.load(file)
+        index.ids, index.documents = data["ids"], data["documents"]
+        index.collection = data.get("collection")
+        return index
+
+    @classmethod
+    def load_or_build(cls, collection, directory: str) -> "SimilarityIndex":
+        """
+        Load the index saved in this directory, adding any products that have been added to the collection since,
+        or build it from the collection and save it if there isn't one yet
+        Products are assumed to be added to the collection and never removed, so new ones are read from the end;
+        if the saved index was made from a different collection, or one with more products than this, it's rebuilt
+        """
+        if os.path.exists(os.path.join(directory, "documents.json")):
+            index = cls.load(directory)
+            count = collection.count()
+            if index.collection == str(collection.id) and count >= len(index):
+                if count > len(index):
+                    ids, vectors, documents, prices = cls.fetch(collection, offset=len(index))
+                    index.add(ids, vectors, documents, prices)
+                    index.save(directory)
+                return index
+        index = cls.from_collection(collection)
+        index.save(directory)
+        return index
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "vectors.npy"), np.asarray(self.vectors))
+        np.save(os.path.join(directory, "norms.npy"), self.norms)
+        np.save(os.path.join(directory, "prices.npy"), self.prices)
+        with open(os.path.join(directory, "documents.json"), "w") as file:
+            json.dump({"collection": self.collection, "ids": self.ids, "documents": self.documents}, file)
+
+    def add(self, ids: List[str], vectors: np.ndarray, documents: List[str], prices: List[float]) -> None:
+        """
+        Add more products to the index
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.ids += list(ids)
+        self.vectors = np.concatenate([self.vectors, vectors])
+        self.norms = np.concatenate([self.norms, (vectors ** 2).sum(axis=1)])
+        self.documents += list(documents)
+        self.prices = np.concatenate([self.prices, np.asarray(prices, dtype=np.float64)])
+
+    def nearest(self, queries: np.ndarray, k: int = 5, batch_size: int = 256) -> np.ndarray:
+        """
+        Return the row numbers of the k nearest products to each query, nearest first
+        ||q - v||^2 = ||q||^2 - 2 q.v + ||v||^2, and ||q||^2 is the same for every product, so it's left out
+        Queries are processed batch_size at a time to bound the size of the distance matrix
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(k, len(self))
+        results = []
+        for start in range(0, len(queries), batch_size):
+            distances = self.norms - 2 * (queries[start:start + batch_size] @ self.vectors.T)
+            top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            order = np.take_along_axis(distances, top, axis=1).argsort(axis=1)
+            results.append(np.take_along_axis(top, order, axis=1))
+        return np.concatenate(results) if results else np.empty((0, k), dtype=int)
+
+    def search(self, queries: np.ndarray, k: int = 5) -> Tuple[List[List[str]], List[List[float]]]:
+        """
+        Return the documents and prices of the k most similar products for each query vector, like a Chroma query
+        """
+        rows = self.nearest(queries, k)
+        documents = [[self.documents[row] for row in query_rows] for query_rows in rows]
+        prices = [[float(self.prices[row]) for row in query_rows] for query_rows in rows]
+        return documents, prices
+
+    def __len__(self) -> int:
+        return len(self.ids)
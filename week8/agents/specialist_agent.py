@@ -1,4 +1,5 @@
 import modal
+from typing import List
 from agents.agent import Agent
 
 
@@ -27,3 +28,12 @@ class SpecialistAgent(Agent):
         result = self.pricer.price.remote(description)
         self.log(f"Specialist Agent completed - predicting ${result:.2f}")
         return result
+
+    def price_many(self, descriptions: List[str]) -> List[float]:
+        """
+        Estimate several items at once, in one remote call that generates them in batches
+        """
+        self.log(f"Specialist Agent is calling remote fine-tuned model for {len(descriptions)} products")
+        results = self.pricer.price_batch.remote(descriptions)
+        self.log("Specialist Agent completed - predicting " + ", ".join(f"${r:.2f}" for r in results))
+        return results
@@ -0,0 +1,107 @@
+import time
+import logging
+import threading
+from typing import Callable, Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor, Future
+
+
+class Warmup:
+    """
+    Loads agents concurrently in background threads, keeping track of how far each one has got
+    Register a factory for each agent with add(), then start(); get() waits for an agent to be ready
+    A factory can call get() for the agents it's made from, so it starts building as soon as they're ready
+    """
+
+    PENDING = "pending"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self):
+        self.factories = {}
+        self.futures = {}
+        self.states = {}
+        self.started = {}
+        self.seconds = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+        self.pool = None
+
+    def add(self, name: str, factory: Callable[[], Any]) -> None:
+        self.factories[name] = factory
+        self.futures[name] = Future()
+        self.states[name] = self.PENDING
+
+    def start(self) -> "Warmup":
+        """
+        Start loading every agent, each in its own thread
+        """
+        self.pool = ThreadPoolExecutor(max_workers=len(self.factories) or 1, thread_name_prefix="warmup")
+        for name, factory in self.factories.items():
+            self.pool.submit(self.load, name, factory)
+        return self
+
+    def load(self, name: str, factory: Callable[[], Any]) -> None:
+        with self.lock:
+            future = self.futures[name]
+            self.states[name] = self.LOADING
+            self.started[name] = time.perf_counter()
+        try:
+            agent = factory()
+        except Exception as error:
+            with self.lock:
+                self.states[name] = self.FAILED
+                self.seconds[name] = time.perf_counter() - self.started[name]
+                self.errors[name] = f"{type(error).__name__}: {error}"
+            logging.error(f"Warm-up of {name} failed after {self.seconds[name]:.1f}s: {self.errors[name]}")
+            future.set_exception(error)
+            return
+        with self.lock:
+            self.states[name] = self.READY
+            self.seconds[name] = time.perf_counter() - self.started[name]
+        logging.info(f"Warm-up of {name} completed in {self.seconds[name]:.1f}s")
+        future.set_result(agent)
+
+    def retry_failed(self) -> List[str]:
+        """
+        Start loading the agents that failed again - including any that failed because an agent they're made from did -
+        so that a later run can recover from a passing problem without restarting
+        :return: the names of the agents being retried
+        """
+        with self.lock:
+            failed = [name for name, state in self.states.items() if state == self.FAILED]
+            for name in failed:
+                self.futures[name] = Future()
+                self.states[name] = self.PENDING
+                self.errors.pop(name, None)
+                self.seconds.pop(name, None)
+                self.started.pop(name, None)
+        for name in failed:
+            logging.info(f"Retrying warm-up of {name}")
+            self.pool.submit(self.load, name, self.factories[name])
+        return failed
+
+    def get(self, name: str, timeout: float = None) -> Any:
+        """
+        Return this agent, waiting for it to finish loading; raises the factory's exception if it failed
+        """
+        return self.futures[name].result(timeout)
+
+    @property
+    def ready(self) -> bool:
+        with self.lock:
+            return all(state == self.READY for state in self.states.values())
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """
+        The state of each agent, and how long it took to load - or how long it's been loading so far
+        """
+        now = time.perf_counter()
+        with self.lock:
+            status = {}
+            for name, state in self.states.items():
+                seconds = self.seconds.get(name, now - self.started[name] if name in self.started else 0)
+                status[name] = {"state": state, "seconds": round(seconds, 2)}
+                if name in self.errors:
+                    status[name]["error"] = self.errors[name]
+            return status
@@ -0,0 +1,36 @@
+import sys
+import time
+import random
+from local_pricer import LocalPricer, LOCAL_MODEL
+
+# Compare pricing one description at a time with price_batch, using the LocalPricer on CPU,
+# with free decoding and with numeric decoding
+# The stand-in model's prices are meaningless; this measures throughput, checks that batching gives the same answers,
+# and counts the 0s that free decoding falls back to when it can't find a number
+# Usage: python benchmark_pricer.py [descriptions] [model]
+
+WORDS = "wireless stainless steel portable compact rechargeable battery adjustable heavy duty replacement kit black".split()
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    model = sys.argv[2] if len(sys.argv) > 2 else LOCAL_MODEL
+    rng = random.Random(42)
+    descriptions = [" ".join(rng.choices(WORDS, k=rng.randint(20, 80))) for _ in range(count)]
+
+    for numeric in [False, True]:
+        start = time.perf_counter()
+        pricer = LocalPricer(model, numeric=numeric)
+        print(f"\n{'Numeric' if numeric else 'Free'} decoding: loaded {model} in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        single = [pricer.price(description) for description in descriptions]
+        single_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = pricer.price_batch(descriptions)
+        batch_time = time.perf_counter() - start
+
+        print(f"One at a time: {count/single_time:>8,.1f} descriptions/sec")
+        print(f"price_batch:   {count/batch_time:>8,.1f} descriptions/sec")
+        print(f"Batched prices matching single prices: {sum(a == b for a, b in zip(single, batch))}/{count}")
+        print(f"Prices of 0: {sum(price == 0 for price in batch)}/{count}")
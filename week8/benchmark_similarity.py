@@ -0,0 +1,44 @@
+import sys
+import time
+import random
+import numpy as np
+import chromadb
+from agents.similarity_index import SimilarityIndex
+from agents.frontier_agent import FrontierAgent
+
+# Compare the in-process SimilarityIndex with Chroma queries on the products_vectorstore:
+# queries per second for each, and recall@5 of the index against Chroma's results
+# The queries are the stored embeddings of a random sample of products
+# Usage: python benchmark_similarity.py [queries]
+
+DB = "products_vectorstore"
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    collection = chromadb.PersistentClient(path=DB).get_or_create_collection('products')
+    start = time.perf_counter()
+    index = SimilarityIndex.load_or_build(collection, FrontierAgent.INDEX_DIR)
+    print(f"Loaded index of {len(index):,} products in {time.perf_counter() - start:.1f}s")
+
+    rows = random.Random(42).sample(range(len(index)), count)
+    queries = np.asarray(index.vectors[rows])
+
+    start = time.perf_counter()
+    chroma_ids = [collection.query(query_embeddings=[query.astype(float).tolist()], n_results=5)['ids'][0] for query in queries]
+    chroma_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for query in queries:
+        index.nearest(query, 5)
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    nearest = index.nearest(queries, 5)
+    batch_time = time.perf_counter() - start
+
+    index_ids = [[index.ids[row] for row in query_rows] for query_rows in nearest]
+    recall = np.mean([len(set(a) & set(b)) / 5 for a, b in zip(index_ids, chroma_ids)])
+    print(f"Chroma, one query at a time: {count/chroma_time:>10,.0f} queries/sec")
+    print(f"Index, one query at a time:  {count/single_time:>10,.0f} queries/sec")
+    print(f"Index, one batch:            {count/batch_time:>10,.0f} queries/sec")
+    print(f"Recall@5 of the index against Chroma: {recall:.3f}")
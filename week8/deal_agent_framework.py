@@ -1,15 +1,23 @@
 import os
 import sys
 import logging
-import json
+import threading
 from typing import List, Optional
 from twilio.rest import Client
 from dotenv import load_dotenv
 import chromadb
 from agents.planning_agent import PlanningAgent
+from agents.scanner_agent import ScannerAgent
+from agents.ensemble_agent import EnsembleAgent
+from agents.messaging_agent import MessagingAgent
+from agents.specialist_agent import SpecialistAgent
+from agents.frontier_agent import FrontierAgent
+from agents.random_forest_agent import RandomForestAgent
+from agents.warmup import Warmup
 from agents.deals import Opportunity
-from sklearn.manifold import TSNE
-import numpy as np
+from agents.memory import OpportunityMemory
+from plot_cache import PlotCache
+from run_scheduler import RunScheduler
 
 
 # Colors for logging
@@ -37,7 +45,9 @@ def init_logging():
 class DealAgentFramework:
 
     DB = "products_vectorstore"
-    MEMORY_FILENAME = "memory.json"
+    MEMORY_FILENAME = "memory.jsonl"
+    LEGACY_MEMORY_FILENAME = "memory.json"
+    PLOT_CACHE = "products_plot"
 
     def __init__(self):
         init_logging()
@@ -46,53 +56,85 @@ class DealAgentFramework:
         self.memory = self.read_memory()
         self.collection = client.get_or_create_collection('products')
         self.planner = None
+        self.warmup = None
+        self.warmup_lock = threading.Lock()
+        self.scheduler = RunScheduler(self.run)
+
+    def warm_up(self) -> Warmup:
+        """
+        Start loading the agents concurrently in background threads, if that hasn't been started already
+        Each agent is built as soon as the agents it's made from are ready
+        """
+        with self.warmup_lock:
+            if not self.warmup:
+                warmup = Warmup()
+                warmup.add("scanner", ScannerAgent)
+                warmup.add("messenger", MessagingAgent)
+                warmup.add("specialist", SpecialistAgent)
+                warmup.add("frontier", lambda: FrontierAgent(self.collection))
+                warmup.add("random_forest", RandomForestAgent)
+                warmup.add("ensemble", lambda: EnsembleAgent(self.collection, warmup.get("specialist"), warmup.get("frontier"), warmup.get("random_forest")))
+                warmup.add("planner", lambda: PlanningAgent(self.collection, warmup.get("scanner"), warmup.get("ensemble"), warmup.get("messenger")))
+                self.warmup = warmup.start()
+            return self.warmup
 
     def init_agents_as_needed(self):
         if not self.planner:
             self.log("Initializing Agent Framework")
-            self.planner = PlanningAgent(self.collection)
+            warmup = self.warm_up()
+            retrying = warmup.retry_failed()
+            if retrying:
+                self.log(f"Retrying agents that failed to load: {', '.join(retrying)}")
+            self.planner = warmup.get("planner")
             self.log("Agent Framework is ready")
         
-    def read_memory(self) -> List[Opportunity]:
-        if os.path.exists(self.MEMORY_FILENAME):
-            with open(self.MEMORY_FILENAME, "r") as file:
-                data = json.load(file)
-            opportunities = [Opportunity(**item) for item in data]
-            return opportunities
-        return []
+    def read_memory(self) -> OpportunityMemory:
+        return OpportunityMemory(self.MEMORY_FILENAME, self.LEGACY_MEMORY_FILENAME)
 
     def write_memory(self) -> None:
-        data = [opportunity.dict() for opportunity in self.memory]
-        with open(self.MEMORY_FILENAME, "w") as file:
-            json.dump(data, file, indent=2)
+        self.memory.compact()
 
     def log(self, message: str):
         text = BG_BLUE + WHITE + "[Agent Framework] " + message + RESET
         logging.info(text)
 
-    def run(self) -> List[Opportunity]:
+    def run(self) -> OpportunityMemory:
         self.init_agents_as_needed()
         logging.info("Kicking off Planning Agent")
-        result = self.planner.plan(memory=self.memory)
-        logging.info(f"Planning Agent has completed and returned: {result}")
-        if result:
+        results = self.planner.surface(memory=self.memory)
+        logging.info(f"Planning Agent has completed and returned: {results}")
+        for result in results:
             self.memory.append(result)
-            self.write_memory()
         return self.memory
 
+    @classmethod
+    def plot_cache_path(cls, max_datapoints: int) -> str:
+        return f"{cls.PLOT_CACHE}_{max_datapoints}.npz"
+
+    @staticmethod
+    def plot_data_for(cache: PlotCache):
+        colors = [COLORS[CATEGORIES.index(c)] for c in cache.categories]
+        return cache.documents, cache.points, colors
+
     @classmethod
     def get_plot_data(cls, max_datapoints=10000):
+        """
+        Return the documents, 3D t-SNE coordinates and colors of up to max_datapoints products,
+        from the plot cache beside the vector store, bringing it up to date with the collection first
+        """
         client = chromadb.PersistentClient(path=cls.DB)
         collection = client.get_or_create_collection('products')
-        result = collection.get(include=['embeddings', 'documents', 'metadatas'], limit=max_datapoints)
-        vectors = np.array(result['embeddings'])
-        documents = result['documents']
-        categories = [metadata['category'] for metadata in result['metadatas']]
-        colors = [COLORS[CATEGORIES.index(c)] for c in categories]
-        tsne = TSNE(n_components=3, random_state=42, n_jobs=-1)
-        reduced_vectors = tsne.fit_transform(vectors)
-        return documents, reduced_vectors, colors
+        cache = PlotCache.load_or_build(collection, cls.plot_cache_path(max_datapoints), max_datapoints)
+        return cls.plot_data_for(cache)
 
+    @classmethod
+    def get_cached_plot_data(cls, max_datapoints=10000):
+        """
+        Return the plot data straight from the cache file, without checking it against the collection,
+        or None if there's no cache yet
+        """
+        path = cls.plot_cache_path(max_datapoints)
+        return cls.plot_data_for(PlotCache.load(path)) if os.path.exists(path) else None
 
 if __name__=="__main__":
     DealAgentFramework().run()
@@ -1,6 +1,7 @@
-from typing import Optional
-from transformers import AutoTokenizer
+from typing import Optional, List
+import os
 import re
+import sys
 
 BASE_MODEL = "meta-llama/Meta-Llama-3.1-8B"
 MIN_TOKENS = 150
@@ -8,15 +9,99 @@ MAX_TOKENS = 160
 MIN_CHARS = 300
 CEILING_CHARS = MAX_TOKENS * 7
 
+# The tokenizer is saved here as a fast-tokenizer JSON after the first download, so later loads are local
+
+TOKENIZER_CACHE = os.getenv("TOKENIZER_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "pricer-tokenizers"))
+
+def load_tokenizer():
+    """
+    Load the tokenizer for BASE_MODEL from the local cache, or download it and save it there
+    transformers is only imported here, so that importing items.py stays fast
+    """
+    from transformers import AutoTokenizer, PreTrainedTokenizerFast
+    path = os.path.join(TOKENIZER_CACHE, BASE_MODEL.replace("/", "--"))
+    if os.path.exists(os.path.join(path, "tokenizer.json")):
+        return PreTrainedTokenizerFast.from_pretrained(path)
+    tokenizer = AutoTokenizer.from_pretrained(BASE_MODEL, trust_remote_code=True)
+    tokenizer.save_pretrained(path)
+    return tokenizer
+
+class LazyTokenizer:
+    """
+    Makes Item.tokenizer load the tokenizer the first time it's used, rather than when items.py is imported
+    """
+    tokenizer = None
+
+    def __get__(self, instance, owner):
+        if LazyTokenizer.tokenizer is None:
+            LazyTokenizer.tokenizer = load_tokenizer()
+        return LazyTokenizer.tokenizer
+
+class Scrubber:
+    """
+    The text cleaning used by Item.scrub and Item.scrub_details, with its regular expressions compiled once,
+    and batch versions that clean a whole chunk of text at a time
+    The output is exactly the same as the original step-by-step versions
+    """
+
+    PUNCTUATION = re.compile(r'[:\[\]"{}【】\s]+')
+
+    def __init__(self, removals):
+        self.removals = removals
+        self.product_numbers = None
+
+    def compile_product_numbers(self):
+        """
+        Compile a regex that matches a space followed by a word of 7+ chars containing a digit
+        str.isdigit() is True for a few more chars than \\d (like superscripts), so those are added to the class
+        as ranges to give exactly the same words as the original check; finding them takes a moment, so it's done on first use
+        """
+        ranges = []
+        for c in range(sys.maxunicode + 1):
+            if chr(c).isdigit() and not chr(c).isdecimal():
+                if ranges and ranges[-1][1] == c - 1:
+                    ranges[-1][1] = c
+                else:
+                    ranges.append([c, c])
+        extras = "".join(f"{re.escape(chr(start))}-{re.escape(chr(end))}" for start, end in ranges)
+        return re.compile(rf" (?=[^ ]{{7}})[^ ]*[\d{extras}][^ ]*(?= |\Z)")
+
+    def scrub_details(self, details: str) -> str:
+        """
+        Remove each of the removals in turn - the order matters, as removing one can create or break up another,
+        so this can't be done as a single regex; str.replace is also faster than a regex alternation here
+        """
+        for remove in self.removals:
+            details = details.replace(remove, "")
+        return details
+
+    def scrub_details_batch(self, details: List[str]) -> List[str]:
+        return [self.scrub_details(d) for d in details]
+
+    def scrub(self, stuff: str) -> str:
+        """
+        Collapse punctuation and whitespace to single spaces, tidy up commas,
+        then remove words that are 7+ chars and contain numbers
+        """
+        if self.product_numbers is None:
+            self.product_numbers = self.compile_product_numbers()
+        stuff = self.PUNCTUATION.sub(' ', stuff).strip()
+        stuff = stuff.replace(" ,", ",").replace(",,,",",").replace(",,",",")
+        return self.product_numbers.sub("", " " + stuff)[1:]
+
+    def scrub_batch(self, texts: List[str]) -> List[str]:
+        return [self.scrub(text) for text in texts]
+
 class Item:
     """
     An Item is a cleaned, curated datapoint of a Product with a Price
     """
     
-    tokenizer = AutoTokenizer.from_pretrained(BASE_MODEL, trust_remote_code=True)
+    tokenizer = LazyTokenizer()
     PREFIX = "Price is $"
     QUESTION = "How much does this cost to the nearest dollar?"
     REMOVALS = ['"Batteries Included?": "No"', '"Batteries Included?": "Yes"', '"Batteries Required?": "No"', '"Batteries Required?": "Yes"', "By Manufacturer", "Item", "Date First", "Package", ":", "Number of", "Best Sellers", "Number", "Product "]
+    scrubber = Scrubber(REMOVALS)
 
     title: str
     price: float
@@ -35,22 +120,15 @@ class Item:
         """
         Clean up the details string by removing common text that doesn't add value
         """
-        details = self.details
-        for remove in self.REMOVALS:
-            details = details.replace(remove, "")
-        return details
+        return self.scrubber.scrub_details(self.details)
 
     def scrub(self, stuff):
         """
         Clean up the provided text by removing unnecessary characters and whitespace
         Also remove words that are 7+ chars and contain numbers, as these are likely irrelevant product numbers
         """
-        stuff = re.sub(r'[:\[\]"{}【】\s]+', ' ', stuff).strip()
-        stuff = stuff.replace(" ,", ",").replace(",,,",",").replace(",,",",")
-        words = stuff.split(' ')
-        select = [word for word in words if len(word)<7 or not any(char.isdigit() for char in word)]
-        return " ".join(select)
-    
+        return self.scrubber.scrub(stuff)
+
     def parse(self, data):
         """
         Parse this datapoint and if it fits within the allowed Token range,
@@ -0,0 +1,139 @@
+import copy
+from typing import List, Optional
+
+# The parts of the pricer that don't depend on Modal: building the prompt, constrained generation and parsing,
+# used by the Pricer service in pricer_service2.py, and the LocalPricer that runs them in this process
+# torch and transformers are imported where they're used, so this module can be imported without them
+
+QUESTION = "How much does this cost to the nearest dollar?"
+PREFIX = "Price is $"
+BATCH_SIZE = 16
+LOCAL_MODEL = "HuggingFaceTB/SmolLM2-135M"
+
+
+def prompt_for(description: str) -> str:
+    return f"{QUESTION}\n\n{description}\n\n{PREFIX}"
+
+
+def parse_price(result: str) -> float:
+    """
+    Pluck the price out of freely generated text - 0 if there isn't one
+    """
+    import re
+    contents = result.replace(',','')
+    match = re.search(r"[-+]?\d*\.\d+|\d+", contents)
+    return float(match.group()) if match else 0
+
+
+def numeric_price(reply: str) -> float:
+    """
+    Convert a reply written with numeric decoding into a price, which should never fail
+    """
+    try:
+        return float(reply)
+    except ValueError:
+        raise ValueError(f"Numeric decoding produced {reply!r}, which isn't a price - "
+                         "NumericDecoding may not recognise this tokenizer's digit tokens correctly") from None
+
+
+class NumericDecoding:
+    """
+    A logits processor that only lets the model write a number: the first token must be digits, and after that
+    it can continue with digits or a single decimal point, or stop
+    The chance of stopping is everything the model puts on other tokens, so generation ends exactly where the model
+    would have left the number, usually after 1 or 2 tokens, and the new tokens always parse as a float
+    Build one per tokenizer with NumericDecoding(tokenizer), then use for_prompt(prompt_length) for each generate call
+    """
+
+    def __init__(self, tokenizer):
+        """
+        A token counts as a digit or decimal point token only if its raw form is exactly its text:
+        decoding a single SentencePiece token like "▁5" drops the space marker, but it would add a space to the reply
+        """
+        import re
+        import torch
+        ids = list(range(len(tokenizer)))
+        raw = tokenizer.convert_ids_to_tokens(ids)
+        texts = [text if text == (token or "") else "" for token, text in zip(raw, (tokenizer.decode([id]) for id in ids))]
+        self.digits = torch.tensor([bool(re.fullmatch(r"[0-9]+", text)) for text in texts])
+        self.points = torch.tensor([bool(re.fullmatch(r"[0-9]*\.[0-9]*", text)) for text in texts])
+        self.eos_token_id = tokenizer.eos_token_id
+        self.prompt_length = 0
+
+    def for_prompt(self, prompt_length: int) -> "NumericDecoding":
+        processor = copy.copy(self)
+        processor.prompt_length = prompt_length
+        return processor
+
+    def masks(self, scores):
+        """
+        The digit and decimal point masks, on the same device as the scores and padded out to the model's vocab size
+        """
+        import torch.nn.functional as F
+        padding = scores.shape[-1] - len(self.digits)
+        return F.pad(self.digits, (0, padding)).to(scores.device), F.pad(self.points, (0, padding)).to(scores.device)
+
+    def __call__(self, input_ids, scores):
+        import torch
+        digits, points = self.masks(scores)
+        generated = input_ids[:, self.prompt_length:]
+        if generated.shape[1] == 0:
+            return scores.masked_fill(~digits, -float("inf"))
+        has_point = points[generated].any(dim=1, keepdim=True)
+        allowed = digits | (points & ~has_point)
+        stop = torch.logsumexp(scores.masked_fill(allowed, -float("inf")), dim=1)
+        constrained = scores.masked_fill(~allowed, -float("inf"))
+        constrained[:, self.eos_token_id] = stop
+        return constrained
+
+
+def generate_prices(model, tokenizer, descriptions: List[str], device: str, numeric: Optional[NumericDecoding] = None,
+                    batch_size: int = BATCH_SIZE) -> List[float]:
+    """
+    Price these descriptions batch_size at a time, generating each batch in a single call
+    The tokenizer must pad on the left, so that every prompt in a batch ends right where generation starts
+    With numeric decoding, the model can only write a number, and stops as soon as it's done;
+    otherwise it generates 5 tokens freely and the price is plucked out of them
+    Only the newly generated tokens are decoded
+    """
+    import torch
+    from transformers import set_seed, LogitsProcessorList
+
+    set_seed(42)
+    results = []
+    for start in range(0, len(descriptions), batch_size):
+        prompts = [prompt_for(description) for description in descriptions[start:start + batch_size]]
+        inputs = tokenizer(prompts, return_tensors="pt", padding=True).to(device)
+        prompt_length = inputs["input_ids"].shape[1]
+        processors = LogitsProcessorList([numeric.for_prompt(prompt_length)] if numeric else [])
+        with torch.no_grad():
+            outputs = model.generate(**inputs, max_new_tokens=5, num_return_sequences=1, logits_processor=processors,
+                                     eos_token_id=tokenizer.eos_token_id, pad_token_id=tokenizer.pad_token_id)
+        replies = tokenizer.batch_decode(outputs[:, prompt_length:], skip_special_tokens=True)
+        results += [numeric_price(reply) if numeric else parse_price(reply) for reply in replies]
+    return results
+
+
+class LocalPricer:
+    """
+    The Pricer, running in this process - by default on CPU, with a small stand-in model in place of the fine-tuned Llama
+    Its prices are meaningless unless it's given a model fine-tuned on this prompt, but it exercises the same batching
+    and parsing, so they can be tried and timed without Modal or a GPU
+    """
+
+    def __init__(self, model_name: str = LOCAL_MODEL, device: str = "cpu", numeric: bool = True):
+        from transformers import AutoTokenizer, AutoModelForCausalLM
+
+        self.device = device
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.tokenizer.pad_token = self.tokenizer.pad_token or self.tokenizer.eos_token
+        self.tokenizer.padding_side = "left"
+        self.model = AutoModelForCausalLM.from_pretrained(model_name).to(device)
+        self.model.eval()
+        self.numeric = NumericDecoding(self.tokenizer) if numeric else None
+
+    def price(self, description: str) -> float:
+        return generate_prices(self.model, self.tokenizer, [description], self.device, self.numeric)[0]
+
+    def price_batch(self, descriptions: List[str]) -> List[float]:
+        return generate_prices(self.model, self.tokenizer, descriptions, self.device, self.numeric)
@@ -1,3 +1,8 @@
+import logging
+import threading
+from collections import deque
+from typing import Callable, List, Optional, Tuple
+
 # Foreground colors
 RED = '\033[31m'
 GREEN = '\033[32m'
@@ -32,4 +37,69 @@ def reformat(message):
     message = message.replace(RESET, '</span>')
     return message
     
-    
\ No newline at end of file
+    
+
+class LogBus(logging.Handler):
+    """
+    A publish/subscribe bus for log messages, so the UI can follow the agents' logs without polling
+    It's installed once, as a single handler on the root logger, and keeps the most recent messages in a ring buffer,
+    numbered in order; each subscriber keeps a cursor - the number of messages it's seen - and waits for more
+    A subscriber that falls more than capacity messages behind skips the ones that have dropped out of the buffer
+    """
+
+    instance = None
+    instance_lock = threading.Lock()
+
+    @classmethod
+    def install(cls) -> "LogBus":
+        """
+        Return the bus, adding it to the root logger the first time
+        """
+        with cls.instance_lock:
+            if cls.instance is None:
+                cls.instance = cls()
+                cls.instance.setFormatter(logging.Formatter(
+                    "[%(asctime)s] %(message)s",
+                    datefmt="%Y-%m-%d %H:%M:%S %z",
+                ))
+                logger = logging.getLogger()
+                logger.addHandler(cls.instance)
+                logger.setLevel(logging.INFO)
+            return cls.instance
+
+    def __init__(self, capacity: int = 1000):
+        super().__init__()
+        self.messages = deque(maxlen=capacity)
+        self.count = 0
+        self.condition = threading.Condition()
+
+    def emit(self, record):
+        message = self.format(record)
+        with self.condition:
+            self.messages.append(message)
+            self.count += 1
+            self.condition.notify_all()
+
+    def cursor(self) -> int:
+        """
+        A cursor for a new subscriber, which will receive messages published from now on
+        """
+        with self.condition:
+            return self.count
+
+    def wake(self) -> None:
+        """
+        Wake up the subscribers that are waiting, so they check their stop condition
+        """
+        with self.condition:
+            self.condition.notify_all()
+
+    def read(self, cursor: int, stop: Callable[[], bool] = lambda: False, timeout: Optional[float] = None) -> Tuple[int, List[str]]:
+        """
+        Wait until there are messages after this cursor, stop() is true, or the timeout passes
+        :return: the new cursor, and the messages after the old one that are still in the buffer
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.count != cursor or stop(), timeout)
+            new = min(self.count - cursor, len(self.messages))
+            return self.count, [self.messages[i] for i in range(-new, 0)]
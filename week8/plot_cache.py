@@ -0,0 +1,102 @@
+import os
+import json
+from typing import List
+import numpy as np
+from sklearn.manifold import TSNE
+
+
+class PlotCache:
+    """
+    The 3D t-SNE coordinates of products in the Chroma datastore, fitted once and saved to a file, so the UI can draw
+    its plot without refitting every time it starts
+    The file records the version of the collection it was made from - the collection's id and how many products it held
+    If products have been added since, they're placed among their nearest neighbours rather than refitting everything;
+    if the collection has been rebuilt, or more than refit_ratio new products have arrived, it's fitted again
+    """
+
+    NEIGHBOURS = 10
+
+    def __init__(self, ids: List[str], embeddings: np.ndarray, points: np.ndarray, documents: List[str], categories: List[str], version: dict):
+        self.ids = list(ids)
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.points = np.asarray(points, dtype=np.float32)
+        self.documents = list(documents)
+        self.categories = list(categories)
+        self.version = version
+
+    @staticmethod
+    def version_of(collection) -> dict:
+        return {"collection": str(collection.id), "count": collection.count()}
+
+    @staticmethod
+    def fetch(collection, offset: int, limit: int):
+        """
+        Read the ids, embeddings, documents and categories of up to limit products, starting at offset
+        """
+        result = collection.get(include=['embeddings', 'documents', 'metadatas'], offset=offset, limit=limit)
+        embeddings = np.array(result['embeddings'], dtype=np.float32).reshape(len(result['ids']), -1)
+        categories = [metadata['category'] for metadata in result['metadatas']]
+        return result['ids'], embeddings, result['documents'], categories
+
+    @classmethod
+    def fit(cls, collection, limit: int) -> "PlotCache":
+        version = cls.version_of(collection)
+        ids, embeddings, documents, categories = cls.fetch(collection, 0, limit)
+        tsne = TSNE(n_components=3, random_state=42, n_jobs=-1)
+        points = tsne.fit_transform(embeddings)
+        return cls(ids, embeddings, points, documents, categories, version)
+
+    def project(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Place new products in the existing plot: each one goes at the average position of its nearest fitted products,
+        weighted by how close they are in the embedding space
+        """
+        k = min(self.NEIGHBOURS, len(self.ids))
+        distances = (embeddings ** 2).sum(axis=1)[:, None] - 2 * embeddings @ self.embeddings.T + (self.embeddings ** 2).sum(axis=1)
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        weights = 1 / (np.sqrt(np.maximum(np.take_along_axis(distances, nearest, axis=1), 0)) + 1e-6)
+        weights /= weights.sum(axis=1, keepdims=True)
+        return (weights[:, :, None] * self.points[nearest]).sum(axis=1)
+
+    def add(self, ids: List[str], embeddings: np.ndarray, documents: List[str], categories: List[str], version: dict) -> None:
+        self.points = np.concatenate([self.points, self.project(embeddings)])
+        self.embeddings = np.concatenate([self.embeddings, embeddings])
+        self.ids += list(ids)
+        self.documents += list(documents)
+        self.categories += list(categories)
+        self.version = version
+
+    @classmethod
+    def load(cls, path: str) -> "PlotCache":
+        with np.load(path) as data:
+            return cls(data["ids"].tolist(), data["embeddings"], data["points"], data["documents"].tolist(), data["categories"].tolist(), json.loads(str(data["version"])))
+
+    def save(self, path: str) -> None:
+        """
+        Write to a temporary file and then replace, so a reader never sees a half-written cache
+        """
+        temp = path + ".tmp.npz"
+        np.savez(temp, ids=np.array(self.ids), embeddings=self.embeddings, points=self.points, documents=np.array(self.documents),
+                 categories=np.array(self.categories), version=np.array(json.dumps(self.version)))
+        os.replace(temp, path)
+
+    @classmethod
+    def load_or_build(cls, collection, path: str, limit: int, refit_ratio: float = 0.5) -> "PlotCache":
+        """
+        Return the plot data for the first limit products in the collection, from the cache file if it's up to date,
+        adding any new products to it, or fitting it from scratch if there isn't a usable one; the file is kept up to date
+        Products are assumed to be added to the collection and never removed, as in the SimilarityIndex
+        """
+        version = cls.version_of(collection)
+        cache = cls.load(path) if os.path.exists(path) else None
+        if cache and cache.version["collection"] == version["collection"] and cache.version["count"] <= version["count"]:
+            if cache.version["count"] == version["count"] or len(cache.ids) >= limit:
+                return cache
+            ids, embeddings, documents, categories = cls.fetch(collection, len(cache.ids), limit - len(cache.ids))
+            if len(ids) <= refit_ratio * len(cache.ids):
+                cache.add(ids, embeddings, documents, categories, version)
+                cache.save(path)
+                return cache
+        cache = cls.fit(collection, limit)
+        cache.save(path)
+        return cache
@@ -1,41 +1,26 @@
+import time
 import logging
-import queue
 import threading
-import time
+from concurrent.futures import Future
 import gradio as gr
+from fastapi.routing import APIRoute
 from deal_agent_framework import DealAgentFramework
 from agents.deals import Opportunity, Deal
-from log_utils import reformat
+from log_utils import reformat, LogBus
 import plotly.graph_objects as go
 
 
-class QueueHandler(logging.Handler):
-    def __init__(self, log_queue):
-        super().__init__()
-        self.log_queue = log_queue
-
-    def emit(self, record):
-        self.log_queue.put(self.format(record))
+LOG_LINES = 18
+LOG_WINDOW = 0.5
 
 def html_for(log_data):
-    output = '<br>'.join(log_data[-18:])
+    output = '<br>'.join(log_data[-LOG_LINES:])
     return f"""
     <div id="scrollContent" style="height: 400px; overflow-y: auto; border: 1px solid #ccc; background-color: #222229; padding: 10px;">
     {output}
     </div>
     """
 
-def setup_logging(log_queue):
-    handler = QueueHandler(log_queue)
-    formatter = logging.Formatter(
-        "[%(asctime)s] %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S %z",
-    )
-    handler.setFormatter(formatter)
-    logger = logging.getLogger()
-    logger.addHandler(handler)
-    logger.setLevel(logging.INFO)
-                
 
 class App:
 
@@ -43,12 +28,24 @@ class App:
         self.agent_framework = None
 
     def get_agent_framework(self):
+        """
+        Create the framework and start its agents warming up in the background, without waiting for them
+        A run waits for the agents it needs when it starts
+        """
         if not self.agent_framework:
             self.agent_framework = DealAgentFramework()
-            self.agent_framework.init_agents_as_needed()
+            self.agent_framework.warm_up()
         return self.agent_framework
 
+    def health(self):
+        """
+        The readiness of each agent and how long it took to load, and the durations of runs so far, served at /health
+        """
+        warmup = self.get_agent_framework().warm_up()
+        return {"ready": warmup.ready, "agents": warmup.status(), "runs": self.get_agent_framework().scheduler.stats()}
+
     def run(self):
+        self.get_agent_framework()
         with gr.Blocks(title="The Price is Right", fill_width=True) as ui:
             
             log_data = gr.State([])
@@ -56,23 +53,6 @@ class App:
             def table_for(opps):
                 return [[opp.deal.product_description, f"${opp.deal.price:.2f}", f"${opp.estimate:.2f}", f"${opp.discount:.2f}", opp.deal.url] for opp in opps]
 
-            def update_output(log_data, log_queue, result_queue):
-                initial_result = table_for(self.get_agent_framework().memory)
-                final_result = None
-                while True:
-                    try:
-                        message = log_queue.get_nowait()
-                        log_data.append(reformat(message))
-                        yield log_data, html_for(log_data), final_result or initial_result
-                    except queue.Empty:
-                        try:
-                            final_result = result_queue.get_nowait()
-                            yield log_data, html_for(log_data), final_result or initial_result
-                        except queue.Empty:
-                            if final_result is not None:
-                                break
-                            time.sleep(0.1)
-
             def get_initial_plot():
                 fig = go.Figure()
                 fig.update_layout(
@@ -81,8 +61,8 @@ class App:
                 )
                 return fig
 
-            def get_plot():
-                documents, vectors, colors = DealAgentFramework.get_plot_data(max_datapoints=1000)
+            def get_plot(plot_data=None):
+                documents, vectors, colors = plot_data or DealAgentFramework.get_plot_data(max_datapoints=1000)
                 # Create the 3D scatter plot
                 fig = go.Figure(data=[go.Scatter3d(
                     x=vectors[:, 0],
@@ -108,30 +88,54 @@ class App:
                 return fig
         
             def do_run():
-                new_opportunities = self.get_agent_framework().run()
+                new_opportunities = self.get_agent_framework().scheduler.trigger().result()
                 table = table_for(new_opportunities)
                 return table
 
             def run_with_logging(initial_log_data):
-                log_queue = queue.Queue()
-                result_queue = queue.Queue()
-                setup_logging(log_queue)
-                
+                """
+                Run the agent framework in a thread, streaming its log messages to the UI as they're published
+                Messages are gathered for up to LOG_WINDOW seconds after the first one arrives, so a burst of logging
+                becomes one update; each update still re-renders the last LOG_LINES lines in full.
+                The table is only sent at the start and the end
+                """
+                bus = LogBus.install()
+                cursor = bus.cursor()
+                result = Future()
+
                 def worker():
-                    result = do_run()
-                    result_queue.put(result)
-                
-                thread = threading.Thread(target=worker)
-                thread.start()
-                
-                for log_data, output, final_result in update_output(initial_log_data, log_queue, result_queue):
-                    yield log_data, output, final_result
+                    try:
+                        result.set_result(do_run())
+                    except Exception as error:
+                        logging.error(f"Agent Framework run failed: {error}")
+                        result.set_exception(error)
+                    finally:
+                        bus.wake()
+
+                threading.Thread(target=worker).start()
+                log_data = initial_log_data[-LOG_LINES:]
+                yield log_data, html_for(log_data), table_for(self.get_agent_framework().memory)
+                while True:
+                    done = result.done()
+                    cursor, messages = bus.read(cursor, stop=result.done)
+                    window_ends = time.monotonic() + LOG_WINDOW
+                    while messages and not done and (remaining := window_ends - time.monotonic()) > 0:
+                        done = result.done()
+                        cursor, more = bus.read(cursor, stop=result.done, timeout=remaining)
+                        messages += more
+                    if messages:
+                        log_data = (log_data + [reformat(message) for message in messages])[-LOG_LINES:]
+                        yield log_data, html_for(log_data), gr.update()
+                    if done:
+                        break
+                table = table_for(self.get_agent_framework().memory) if result.exception() else result.result()
+                yield log_data, html_for(log_data), table
 
             def do_select(selected_index: gr.SelectData):
                 opportunities = self.get_agent_framework().memory
                 row = selected_index.index[0]
                 opportunity = opportunities[row]
-                self.get_agent_framework().planner.messenger.alert(opportunity)
+                self.get_agent_framework().warm_up().get("messenger").alert(opportunity)
         
             with gr.Row():
                 gr.Markdown('<div style="text-align: center;font-size:24px"><strong>The Price is Right</strong> - Autonomous Agent Framework that hunts for deals</div>')
@@ -150,16 +154,20 @@ class App:
                 with gr.Column(scale=1):
                     logs = gr.HTML()
                 with gr.Column(scale=1):
-                    plot = gr.Plot(value=get_plot(), show_label=False)
+                    cached_plot_data = DealAgentFramework.get_cached_plot_data(max_datapoints=1000)
+                    plot = gr.Plot(value=get_plot(cached_plot_data) if cached_plot_data else get_initial_plot(), show_label=False)
         
+            ui.load(get_plot, outputs=[plot])
             ui.load(run_with_logging, inputs=[log_data], outputs=[log_data, logs, opportunities_dataframe])
 
-            timer = gr.Timer(value=300, active=True)
+            scheduler = self.get_agent_framework().scheduler
+            timer = gr.Timer(value=scheduler.next_delay(), active=True)
             timer.tick(run_with_logging, inputs=[log_data], outputs=[log_data, logs, opportunities_dataframe])
+            timer.tick(lambda: gr.Timer(value=scheduler.next_delay()), outputs=[timer])
 
             opportunities_dataframe.select(do_select)
         
-        ui.launch(share=False, inbrowser=True)
+        ui.launch(share=False, inbrowser=True, app_kwargs={"routes": [APIRoute("/health", self.health, methods=["GET"])]})
 
 if __name__=="__main__":
     App().run()
@@ -1,5 +1,7 @@
 import modal
+from typing import List
 from modal import App, Volume, Image
+from local_pricer import NumericDecoding, generate_prices
 
 # Setup - define our infrastructure with code!
 
@@ -21,9 +23,6 @@ MODEL_DIR = "hf-cache/"
 BASE_DIR = MODEL_DIR + BASE_MODEL
 FINETUNED_DIR = MODEL_DIR + FINETUNED_MODEL
 
-QUESTION = "How much does this cost to the nearest dollar?"
-PREFIX = "Price is $"
-
 @app.cls(image=image, secrets=secrets, gpu=GPU, timeout=1800)
 class Pricer:
     @modal.build()
@@ -53,7 +52,7 @@ class Pricer:
         
         self.tokenizer = AutoTokenizer.from_pretrained(BASE_DIR)
         self.tokenizer.pad_token = self.tokenizer.eos_token
-        self.tokenizer.padding_side = "right"
+        self.tokenizer.padding_side = "left"
         
         self.base_model = AutoModelForCausalLM.from_pretrained(
             BASE_DIR, 
@@ -62,28 +61,19 @@ class Pricer:
         )
     
         self.fine_tuned_model = PeftModel.from_pretrained(self.base_model, FINETUNED_DIR, revision=REVISION)
+        self.numeric = NumericDecoding(self.tokenizer)
 
     @modal.method()
     def price(self, description: str) -> float:
-        import os
-        import re
-        import torch
-        from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig, set_seed
-        from peft import PeftModel
-    
-        set_seed(42)
-        prompt = f"{QUESTION}\n\n{description}\n\n{PREFIX}"
-        inputs = self.tokenizer.encode(prompt, return_tensors="pt").to("cuda")
-        attention_mask = torch.ones(inputs.shape, device="cuda")
-        outputs = self.fine_tuned_model.generate(inputs, attention_mask=attention_mask, max_new_tokens=5, num_return_sequences=1)
-        result = self.tokenizer.decode(outputs[0])
-    
-        contents = result.split("Price is $")[1]
-        contents = contents.replace(',','')
-        match = re.search(r"[-+]?\d*\.\d+|\d+", contents)
-        return float(match.group()) if match else 0
+        return generate_prices(self.fine_tuned_model, self.tokenizer, [description], "cuda", self.numeric)[0]
+
+    @modal.method()
+    def price_batch(self, descriptions: List[str]) -> List[float]:
+        """
+        Price a list of descriptions, generating them in padded batches rather than one at a time
+        """
+        return generate_prices(self.fine_tuned_model, self.tokenizer, descriptions, "cuda", self.numeric)
 
     @modal.method()
     def wake_up(self) -> str:
         return "ok"
-
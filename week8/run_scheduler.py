@@ -0,0 +1,94 @@
+import time
+import random
+import logging
+import threading
+from typing import Callable, Any, Dict, Optional
+from concurrent.futures import Future
+
+
+class RunScheduler:
+    """
+    Makes sure that only one run of the agent framework is in flight at a time
+    A trigger while a run is in progress joins that run instead of starting another, and a trigger within min_interval
+    of a successful run gets that run's result; every caller is handed the same Future, so they all get the same result
+    next_delay() is the time until the next scheduled run - interval, give or take jitter, so sessions drift apart
+    The duration of every run is recorded in a histogram
+    """
+
+    BUCKETS = [10, 30, 60, 120, 300, 600, float("inf")]
+
+    def __init__(self, run: Callable[[], Any], interval: float = 300, jitter: float = 0.1, min_interval: float = 60):
+        """
+        :param run: the function that does a run
+        :param interval: the average number of seconds between scheduled runs
+        :param jitter: the fraction of the interval that each delay can vary by, either way
+        :param min_interval: the number of seconds after a successful run during which triggers get its result
+        """
+        self.run = run
+        self.interval = interval
+        self.jitter = jitter
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.current: Optional[Future] = None
+        self.finished_at = 0.0
+        self.histogram = [0] * len(self.BUCKETS)
+        self.total_seconds = 0.0
+        self.runs = 0
+        self.failures = 0
+        self.coalesced = 0
+
+    def trigger(self) -> Future:
+        """
+        Start a run, unless one is in flight or has just finished
+        :return: a Future for the result of the run
+        """
+        with self.lock:
+            current = self.current
+            if current and (not current.done() or (current.exception() is None and time.monotonic() - self.finished_at < self.min_interval)):
+                self.coalesced += 1
+                return current
+            future = self.current = Future()
+        threading.Thread(target=self.execute, args=(future,), name="agent-run", daemon=True).start()
+        return future
+
+    def execute(self, future: Future) -> None:
+        start = time.monotonic()
+        try:
+            result = self.run()
+        except Exception as error:
+            self.record(time.monotonic() - start, failed=True)
+            future.set_exception(error)
+        else:
+            self.record(time.monotonic() - start)
+            future.set_result(result)
+
+    def record(self, seconds: float, failed: bool = False) -> None:
+        with self.lock:
+            self.finished_at = time.monotonic()
+            self.runs += 1
+            self.failures += failed
+            self.total_seconds += seconds
+            self.histogram[next(i for i, bound in enumerate(self.BUCKETS) if seconds <= bound)] += 1
+        logging.info(f"Agent Framework run {'failed' if failed else 'completed'} in {seconds:.1f}s; {self.describe()}")
+
+    def next_delay(self) -> float:
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        The number of runs, failures and coalesced triggers, the mean duration, and the histogram of durations
+        """
+        with self.lock:
+            labels = [f"<={bound:g}s" if bound != float("inf") else f">{self.BUCKETS[-2]:g}s" for bound in self.BUCKETS]
+            return {
+                "runs": self.runs,
+                "failures": self.failures,
+                "coalesced": self.coalesced,
+                "mean_seconds": round(self.total_seconds / self.runs, 1) if self.runs else None,
+                "durations": dict(zip(labels, self.histogram)),
+            }
+
+    def describe(self) -> str:
+        stats = self.stats()
+        histogram = ", ".join(f"{label}: {count}" for label, count in stats["durations"].items() if count)
+        return f"{stats['runs']} runs ({stats['failures']} failed, {stats['coalesced']} triggers coalesced), durations {histogram}"
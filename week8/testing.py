@@ -1,5 +1,17 @@
+import os
+import re
+import csv
+import json
 import math
+import time
+import random
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 
 GREEN = "\033[92m"
 YELLOW = "\033[93m"
@@ -7,13 +19,115 @@ RED = "\033[91m"
 RESET = "\033[0m"
 COLOR_MAP = {"red":RED, "orange": YELLOW, "green": GREEN}
 
+# The edges of the price ranges used to break down the results
+PRICE_BUCKETS = [0, 10, 50, 100, 250, 500, 1000]
+
+def is_rate_limit(error):
+    """
+    Spot a rate limit or overloaded error from the OpenAI, Anthropic or other clients, without importing them
+    """
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status in (429, 529) or "RateLimit" in type(error).__name__
+
+def retry_after(error):
+    """
+    Return the number of seconds the server asked us to wait, if it said
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class PredictionCache:
+    """
+    A persistent cache of guesses in a SQLite file, so that re-running a Tester doesn't pay for the same predictions twice
+    Guesses are keyed by the predictor's name and version, and a hash of the item's test prompt
+    Change the version (or call invalidate) whenever the predictor changes in a way that should give different answers
+    """
+
+    def __init__(self, path="predictions.db"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS predictions (predictor TEXT, prompt_hash TEXT, guess REAL, PRIMARY KEY (predictor, prompt_hash))")
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def predictor_id(predictor, version=None):
+        """
+        Identify a predictor by its module and name, plus a version - taken from a version attribute on the predictor if not given
+        Lambdas, nested functions and callables with no __qualname__ (like a functools.partial) share their name with
+        others, so they need a version to tell them apart; without one this raises a ValueError rather than risk
+        returning another predictor's guesses
+        """
+        qualname = getattr(predictor, "__qualname__", None)
+        name = f"{getattr(predictor, '__module__', '')}.{qualname or type(predictor).__name__}"
+        version = version if version is not None else getattr(predictor, "version", None)
+        if version is None and (qualname is None or "<lambda>" in qualname or "<locals>" in qualname):
+            raise ValueError(f"Can't tell {name} apart from other predictors like it; pass a version to cache its guesses")
+        return f"{name}@{version}" if version is not None else name
+
+    @staticmethod
+    def hash_for(datapoint):
+        return hashlib.sha256(datapoint.test_prompt().encode("utf-8")).hexdigest()
+
+    def get(self, predictor_id, datapoint):
+        """
+        Return the cached guess for this datapoint, or None if there isn't one
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT guess FROM predictions WHERE predictor = ? AND prompt_hash = ?", (predictor_id, self.hash_for(datapoint))).fetchone()
+            if row:
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, predictor_id, datapoint, guess):
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)", (predictor_id, self.hash_for(datapoint), float(guess)))
+            self.connection.commit()
+
+    def invalidate(self, predictor_id=None):
+        """
+        Remove the cached guesses for this predictor id, or for every predictor if none is given
+        """
+        with self.lock:
+            if predictor_id is None:
+                self.connection.execute("DELETE FROM predictions")
+            else:
+                self.connection.execute("DELETE FROM predictions WHERE predictor = ?", (predictor_id,))
+            self.connection.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return f"Cache: {self.hits:,} hits, {self.misses:,} misses ({self.hits/total*100 if total else 0:.1f}% hit rate)"
+
 class Tester:
 
-    def __init__(self, predictor, data, title=None, size=250):
+    def __init__(self, predictor, data, title=None, size=250, workers=1, retries=5, verbose=True, output_dir=None, cache=None, version=None):
+        """
+        Set up a test of this predictor on the first size items of data
+        With workers > 1, that many predictions are made at once in a thread pool, which is much faster for API-backed predictors
+        Predictions that hit a rate limit are retried up to retries times, backing off exponentially
+        Set verbose=False to skip the line for each item, and give an output_dir to run headless: rather than showing
+        the chart, the report is written there as a JSON summary, a CSV of every result and a PNG of the chart
+        Pass a PredictionCache as cache to reuse guesses from earlier runs of the same predictor and version;
+        a lambda or functools.partial needs a version to be cached
+        """
         self.predictor = predictor
         self.data = data
         self.title = title or predictor.__name__.replace("_", " ").title()
         self.size = size
+        self.workers = workers
+        self.retries = retries
+        self.verbose = verbose
+        self.output_dir = output_dir
+        self.cache = cache
+        self.predictor_id = PredictionCache.predictor_id(predictor, version) if cache else None
         self.guesses = []
         self.truths = []
         self.errors = []
@@ -27,49 +141,174 @@ class Tester:
             return "orange"
         else:
             return "red"
-    
-    def run_datapoint(self, i):
+
+    @staticmethod
+    def metrics(guesses, truths):
+        """
+        Calculate the errors, squared log errors and colors for arrays of guesses and truths in one pass
+        """
+        guesses = np.asarray(guesses, dtype=float)
+        truths = np.asarray(truths, dtype=float)
+        errors = np.abs(guesses - truths)
+        sles = (np.log(truths + 1) - np.log(guesses + 1)) ** 2
+        ratios = errors / truths
+        colors = np.where((errors < 40) | (ratios < 0.2), "green", np.where((errors < 80) | (ratios < 0.4), "orange", "red"))
+        return errors, sles, colors
+
+    @staticmethod
+    def summarize(errors, sles, colors):
+        """
+        Return the count, average error, RMSLE and hit rate for these results
+        """
+        count = len(errors)
+        return {
+            "count": count,
+            "average_error": float(errors.mean()) if count else 0.0,
+            "rmsle": float(math.sqrt(sles.mean())) if count else 0.0,
+            "hit_rate": float((colors == "green").mean()) if count else 0.0,
+        }
+
+    def predict(self, datapoint):
+        """
+        Return the cached guess for this datapoint if there is one; otherwise call the predictor
+        """
+        if self.cache:
+            guess = self.cache.get(self.predictor_id, datapoint)
+            if guess is not None:
+                return guess
+        guess = self.call_predictor(datapoint)
+        if self.cache:
+            self.cache.put(self.predictor_id, datapoint, guess)
+        return guess
+
+    def call_predictor(self, datapoint):
+        """
+        Call the predictor, waiting and retrying if it hits a rate limit
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                return self.predictor(datapoint)
+            except Exception as error:
+                if attempt == self.retries or not is_rate_limit(error):
+                    raise
+                time.sleep(retry_after(error) or (2 ** attempt + random.random()))
+
+    def running_metrics(self):
+        """
+        Return a summary of the error, RMSLE and hit rate of the results so far
+        """
+        summary = self.summarize(*self.metrics(self.guesses, self.truths))
+        return f"Error=${summary['average_error']:,.2f} RMSLE={summary['rmsle']:,.2f} Hits={summary['hit_rate']*100:.1f}%"
+
+    def run_datapoint(self, i, guess=None):
         datapoint = self.data[i]
-        guess = self.predictor(datapoint)
+        if guess is None:
+            guess = self.predict(datapoint)
         truth = datapoint.price
-        error = abs(guess - truth)
-        log_error = math.log(truth+1) - math.log(guess+1)
-        sle = log_error ** 2
-        color = self.color_for(error, truth)
-        title = datapoint.title if len(datapoint.title) <= 40 else datapoint.title[:40]+"..."
         self.guesses.append(guess)
         self.truths.append(truth)
-        self.errors.append(error)
-        self.sles.append(sle)
-        self.colors.append(color)
-        print(f"{COLOR_MAP[color]}{i+1}: Guess: ${guess:,.2f} Truth: ${truth:,.2f} Error: ${error:,.2f} SLE: {sle:,.2f} Item: {title}{RESET}")
+        if self.verbose:
+            error = abs(guess - truth)
+            log_error = math.log(truth+1) - math.log(guess+1)
+            sle = log_error ** 2
+            color = self.color_for(error, truth)
+            title = datapoint.title if len(datapoint.title) <= 40 else datapoint.title[:40]+"..."
+            running = f" Running: {self.running_metrics()}" if self.workers > 1 else ""
+            print(f"{COLOR_MAP[color]}{i+1}: Guess: ${guess:,.2f} Truth: ${truth:,.2f} Error: ${error:,.2f} SLE: {sle:,.2f} Item: {title}{running}{RESET}")
+
+    def draw(self, ax, title):
+        max_val = max(max(self.truths), max(self.guesses))
+        ax.plot([0, max_val], [0, max_val], color='deepskyblue', lw=2, alpha=0.6)
+        ax.scatter(self.truths, self.guesses, s=3, c=self.colors)
+        ax.set_xlabel('Ground Truth')
+        ax.set_ylabel('Model Estimate')
+        ax.set_xlim(0, max_val)
+        ax.set_ylim(0, max_val)
+        ax.set_title(title)
 
     def chart(self, title):
-        max_error = max(self.errors)
         plt.figure(figsize=(12, 8))
-        max_val = max(max(self.truths), max(self.guesses))
-        plt.plot([0, max_val], [0, max_val], color='deepskyblue', lw=2, alpha=0.6)
-        plt.scatter(self.truths, self.guesses, s=3, c=self.colors)
-        plt.xlabel('Ground Truth')
-        plt.ylabel('Model Estimate')
-        plt.xlim(0, max_val)
-        plt.ylim(0, max_val)
-        plt.title(title)
+        self.draw(plt.gca(), title)
         plt.show()
 
+    def breakdown(self, keys):
+        """
+        Summarize the results separately for each distinct value in keys
+        """
+        keys = np.asarray(keys)
+        return {str(key): self.summarize(self.errors[keys == key], self.sles[keys == key], self.colors[keys == key]) for key in np.unique(keys)}
+
+    def price_buckets(self):
+        """
+        Label each item with the price range its true price falls in, like "$50-100"
+        """
+        edges = PRICE_BUCKETS
+        labels = [f"${low}-{high}" for low, high in zip(edges, edges[1:])] + [f"${edges[-1]}+"]
+        indexes = np.digitize(self.truths, edges[1:])
+        return np.array(labels)[indexes]
+
+    def summary(self):
+        """
+        Return the overall results, plus breakdowns by category and by price range
+        """
+        categories = [getattr(self.data[i], "category", None) or "Unknown" for i in range(len(self.truths))]
+        return {
+            "title": self.title,
+            **self.summarize(self.errors, self.sles, self.colors),
+            "by_category": self.breakdown(categories),
+            "by_price": self.breakdown(self.price_buckets()),
+        }
+
+    def save(self, summary, title):
+        """
+        Write the summary as JSON, each result as a row of a CSV and the chart as a PNG, without needing a display
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = os.path.join(self.output_dir, re.sub(r"\W+", "_", self.title.lower()).strip("_"))
+        with open(f"{name}.json", "w") as file:
+            json.dump(summary, file, indent=2)
+        with open(f"{name}.csv", "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["index", "title", "guess", "truth", "error", "sle", "color"])
+            for i in range(len(self.truths)):
+                writer.writerow([i, self.data[i].title, self.guesses[i], self.truths[i], self.errors[i], self.sles[i], self.colors[i]])
+        figure = Figure(figsize=(12, 8))
+        self.draw(figure.subplots(), title)
+        figure.savefig(f"{name}.png")
+
     def report(self):
-        average_error = sum(self.errors) / self.size
-        rmsle = math.sqrt(sum(self.sles) / self.size)
-        hits = sum(1 for color in self.colors if color=="green")
-        title = f"{self.title} Error=${average_error:,.2f} RMSLE={rmsle:,.2f} Hits={hits/self.size*100:.1f}%"
-        self.chart(title)
+        self.errors, self.sles, self.colors = self.metrics(self.guesses, self.truths)
+        summary = self.summary()
+        title = f"{self.title} Error=${summary['average_error']:,.2f} RMSLE={summary['rmsle']:,.2f} Hits={summary['hit_rate']*100:.1f}%"
+        if self.cache:
+            summary["cache"] = {"hits": self.cache.hits, "misses": self.cache.misses}
+            print(self.cache.stats())
+        if self.output_dir:
+            self.save(summary, title)
+            print(title)
+        else:
+            self.chart(title)
+        return summary
+
+    def run_concurrently(self):
+        """
+        Make the predictions in a thread pool; results are recorded and printed in order,
+        each one as soon as it and all the ones before it have arrived
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self.predict, self.data[i]) for i in range(self.size)]
+            for i, future in enumerate(futures):
+                self.run_datapoint(i, future.result())
 
     def run(self):
         self.error = 0
-        for i in range(self.size):
-            self.run_datapoint(i)
-        self.report()
+        if self.workers > 1:
+            self.run_concurrently()
+        else:
+            for i in range(self.size):
+                self.run_datapoint(i)
+        return self.report()
 
     @classmethod
-    def test(cls, function, data):
-        cls(function, data).run()
\ No newline at end of file
+    def test(cls, function, data, **kwargs):
+        cls(function, data, **kwargs).run()
\ No newline at end of file
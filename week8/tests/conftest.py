@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tests import the week8 modules the same way the app does, as agents.deals and so on
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,103 @@
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from agents import deals
+from agents.deals import ScrapedDeal, ScrapeCache
+
+# ScrapedDeal.fetch against a local stub server serving a canned RSS feed and deal pages
+
+PAGES = 6
+FAILING = 3
+DUPLICATE_FEATURES = 4
+DELAY = 0.2
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        if self.path == "/feed.xml":
+            server.feed_requests += 1
+            if self.headers.get("If-None-Match") == '"v1"':
+                return self.send(304)
+            items = "".join(
+                f"<item><title>Deal {i}</title><link>{server.url}/deal/{i}</link><description>Summary {i}</description></item>"
+                for i in range(PAGES)
+            )
+            body = f'<?xml version="1.0"?><rss version="2.0"><channel><title>Stub</title>{items}</channel></rss>'.encode()
+            return self.send(200, body, {"Content-Type": "application/rss+xml", "ETag": '"v1"'})
+        index = int(self.path.rsplit("/", 1)[1])
+        with server.lock:
+            server.in_flight += 1
+            server.most_in_flight = max(server.most_in_flight, server.in_flight)
+            server.page_requests += 1
+        try:
+            time.sleep(DELAY)
+            if index == FAILING:
+                return self.send(500)
+            text = f"Details of deal {index} Features fast Features twice" if index == DUPLICATE_FEATURES else f"Details of deal {index} Features fast"
+            self.send(200, f'<html><body><div class="content-section">{text}</div></body></html>'.encode(), {"Content-Type": "text/html"})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    server.lock = threading.Lock()
+    server.in_flight = server.most_in_flight = server.page_requests = server.feed_requests = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(deals, "feeds", [f"{server.url}/feed.xml"])
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_is_concurrent_within_the_per_host_limit(server):
+    start = time.perf_counter()
+    ScrapedDeal.fetch(workers=8, per_host=2, interval=0, cache=ScrapeCache())
+    elapsed = time.perf_counter() - start
+    assert server.most_in_flight == 2
+    assert elapsed < PAGES * DELAY * 0.75
+
+
+def test_fetch_skips_pages_that_fail(server):
+    result = ScrapedDeal.fetch(workers=8, per_host=4, interval=0, cache=ScrapeCache())
+    urls = {deal.url for deal in result}
+    assert len(result) == PAGES - 2
+    assert f"{server.url}/deal/{FAILING}" not in urls
+    assert f"{server.url}/deal/{DUPLICATE_FEATURES}" not in urls
+    assert all(deal.details.strip() and deal.features.strip() == "fast" for deal in result)
+
+
+def test_second_fetch_uses_the_cache_and_still_skips_bad_pages(server):
+    cache = ScrapeCache()
+    first = ScrapedDeal.fetch(workers=8, per_host=4, interval=0, cache=cache)
+    pages_after_first = server.page_requests
+    second = ScrapedDeal.fetch(workers=8, per_host=4, interval=0, cache=cache)
+    assert [deal.url for deal in second] == [deal.url for deal in first]
+    assert f"{server.url}/deal/{DUPLICATE_FEATURES}" not in cache.pages
+    assert server.page_requests - pages_after_first == 2
+    assert server.feed_requests == 2
+
+
+def test_each_page_time_is_logged_at_info(server, caplog):
+    caplog.set_level("INFO")
+    ScrapedDeal.fetch(workers=8, per_host=4, interval=0, cache=ScrapeCache())
+    fetched = [record for record in caplog.records if record.levelname == "INFO" and record.getMessage().startswith("Deal page")]
+    assert len(fetched) == PAGES - 2
@@ -0,0 +1,113 @@
+import json
+import time
+import asyncio
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from openai import BadRequestError
+from agents.llm_client import LLMClient
+
+# LLMClient against a local fake OpenAI-compatible server, whose behaviour depends on the model requested:
+# "flaky-429" and "flaky-500" fail their first call, "slow" takes 2 seconds, "bad" is rejected, and anything else answers
+
+MESSAGES = [{"role": "user", "content": "How much does this cost?"}]
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        model = request["model"]
+        with self.server.lock:
+            self.server.calls[model] += 1
+            first = self.server.calls[model] == 1
+        if model == "flaky-429" and first:
+            return self.send(429, {"error": {"message": "slow down"}}, {"retry-after": "0.05"})
+        if model == "flaky-500" and first:
+            return self.send(500, {"error": {"message": "oops"}})
+        if model == "bad":
+            return self.send(400, {"error": {"message": "bad request"}})
+        if model == "slow":
+            time.sleep(2)
+        self.send(200, {
+            "id": "fake", "object": "chat.completion", "created": 0, "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": f"{model} says 42"}}],
+        })
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.lock = threading.Lock()
+    server.calls = Counter()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client(server, model, **kwargs):
+    fallback = {"fallback_api_key": "key", "fallback_base_url": server.url} if "fallback_model" in kwargs else {}
+    return LLMClient(model, api_key="key", base_url=server.url, **fallback, **kwargs)
+
+
+@pytest.mark.parametrize("model", ["flaky-429", "flaky-500"])
+def test_retries_rate_limits_and_server_errors(server, model):
+    reply = client(server, model).create(messages=MESSAGES)
+    assert reply.choices[0].message.content == f"{model} says 42"
+    assert server.calls[model] == 2
+
+
+def test_does_not_retry_a_bad_request(server):
+    with pytest.raises(BadRequestError):
+        client(server, "bad").create(messages=MESSAGES)
+    assert server.calls["bad"] == 1
+
+
+def test_deadline_covers_the_whole_call(server):
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        client(server, "slow", deadline=0.5).create(messages=MESSAGES)
+    assert time.perf_counter() - start < 1.5
+
+
+def test_hedges_a_slow_primary_with_the_fallback(server):
+    start = time.perf_counter()
+    model, reply = client(server, "slow", fallback_model="fast", hedge_after=0.2).create_with_model(messages=MESSAGES)
+    assert model == "fast"
+    assert reply.choices[0].message.content == "fast says 42"
+    assert time.perf_counter() - start < 1.5
+
+
+def test_a_fast_primary_is_not_hedged(server):
+    model, _ = client(server, "quick", fallback_model="fast", hedge_after=1).create_with_model(messages=MESSAGES)
+    assert model == "quick"
+    assert server.calls["fast"] == 0
+
+
+def test_async_calls_run_concurrently(server):
+    llm = client(server, "slow", max_concurrency=4)
+
+    async def main():
+        return await asyncio.gather(*[llm.acreate(messages=MESSAGES) for _ in range(4)])
+
+    start = time.perf_counter()
+    replies = asyncio.run(main())
+    assert len(replies) == 4
+    assert time.perf_counter() - start < 4
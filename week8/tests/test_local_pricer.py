@@ -0,0 +1,57 @@
+import string
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from tokenizers import Tokenizer, models, pre_tokenizers, decoders
+from transformers import PreTrainedTokenizerFast, LlamaConfig, LlamaForCausalLM
+from local_pricer import LocalPricer, NumericDecoding, numeric_price
+
+# Numeric decoding and batching in the LocalPricer, on CPU with a tiny randomly initialised Llama
+# The tokenizer is character-level but decodes like SentencePiece, and also has "▁5"-style tokens: a space and a digit
+
+
+@pytest.fixture(scope="module")
+def tokenizer():
+    vocab = {"<s>": 0, "</s>": 1}
+    for piece in list(string.printable) + ["12", "99", ".5"] + [f"▁{digit}" for digit in string.digits]:
+        vocab.setdefault(piece, len(vocab))
+    tokenizer = Tokenizer(models.WordPiece(vocab, unk_token="</s>", max_input_chars_per_word=1000))
+    tokenizer.pre_tokenizer = pre_tokenizers.Split("", "isolated")
+    tokenizer.decoder = decoders.Metaspace()
+    return PreTrainedTokenizerFast(tokenizer_object=tokenizer, bos_token="<s>", eos_token="</s>")
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory, tokenizer):
+    directory = tmp_path_factory.mktemp("tiny")
+    torch.manual_seed(0)
+    config = LlamaConfig(vocab_size=len(tokenizer), hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+                         num_attention_heads=4, num_key_value_heads=4, bos_token_id=0, eos_token_id=1)
+    LlamaForCausalLM(config).save_pretrained(directory)
+    tokenizer.save_pretrained(directory)
+    return str(directory)
+
+
+def test_masks_only_include_tokens_that_are_purely_digits_or_a_point(tokenizer):
+    numeric = NumericDecoding(tokenizer)
+    digits = {tokenizer.convert_ids_to_tokens(i) for i in torch.nonzero(numeric.digits).flatten().tolist()}
+    points = {tokenizer.convert_ids_to_tokens(i) for i in torch.nonzero(numeric.points).flatten().tolist()}
+    assert digits == set(string.digits) | {"12", "99"}
+    assert points == {".", ".5"}
+
+
+def test_numeric_decoding_always_gives_a_price(model_dir):
+    pricer = LocalPricer(model_dir)
+    descriptions = [f"Product {i} " + "widget " * (i % 5) for i in range(12)]
+    single = [pricer.price(description) for description in descriptions]
+    batch = pricer.price_batch(descriptions)
+    assert batch == single
+    assert all(isinstance(price, float) and price >= 0 for price in batch)
+
+
+def test_a_reply_that_is_not_a_number_is_an_error():
+    assert numeric_price("12.5") == 12.5
+    with pytest.raises(ValueError, match="isn't a price"):
+        numeric_price("12 5")